@@ -1,15 +1,18 @@
 """
 管理员管理与文献审核 API
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from datetime import datetime
 from typing import List, Optional
 from backend.database import get_db
 from backend.models import User, Paper
+from backend import crud, compact_db
 from backend.security import get_current_superadmin, get_current_admin
 from backend.email_service import email_service
+from backend.utils.event_broadcaster import publish_event
+from backend.utils.doi_resolver import doi_resolver
 
 router = APIRouter(prefix="/api/admin", tags=["管理员"])
 
@@ -347,6 +350,17 @@ async def review_paper(
         
     db.commit()
 
+    publish_event("paper.reviewed", {
+        "paper_ids": [paper.id],
+        "status": paper.review_status,
+        "reviewer": current_user.real_name
+    }, admin_only=True)
+    publish_event("dataset.changed", {
+        "reason": "review",
+        "paper_ids": [paper.id],
+        "chart": bool(paper.show_in_chart)
+    })
+
     return {
         "message": f"文献审核状态已更新为: {request.status}",
         "paper_id": paper.id,
@@ -511,6 +525,7 @@ async def get_all_papers(
 
     # 分页查询
     papers = query.order_by(Paper.created_at.desc()).offset(offset).limit(limit).all()
+    image_counts = crud.get_paper_image_counts(db, [paper.id for paper in papers])
 
     return {
         "total": total,
@@ -535,7 +550,7 @@ async def get_all_papers(
                 "reviewer_name": paper.reviewer.real_name if paper.reviewer else None,
                 "contributor_name": paper.contributor_name,
                 "created_at": paper.created_at.isoformat(),
-                "images_count": len(paper.images),
+                "images_count": image_counts.get(paper.id, 0),
                 "show_in_chart": paper.show_in_chart
             }
             for paper in papers
@@ -656,6 +671,8 @@ async def update_paper(
         if new_data is not None:
             # 删除旧数据
             from backend.models import PaperData
+            old_ids = [row[0] for row in db.query(PaperData.id).filter(PaperData.paper_id == paper_id).all()]
+            crud.record_paper_data_deletion(db, paper_id, old_ids)
             db.query(PaperData).filter(PaperData.paper_id == paper_id).delete()
             db.flush() # 确保删除执行
             # 插入新数据
@@ -715,15 +732,25 @@ async def delete_paper(
         "doi": paper.doi,
         "title": paper.title,
         "compound": paper.compound.element_symbols,
-        "images_count": len(paper.images),
+        "images_count": crud.get_paper_image_count(db, paper.id),
         "deleted_by": current_user.real_name,
         "deleted_at": datetime.utcnow().isoformat()
     }
 
-    # 删除文献（会自动级联删除 paper_images）
+    in_chart = bool(paper.show_in_chart)
+
+    # 删除文献（会自动级联删除 paper_images），同时写入同步墓碑
+    crud.record_paper_deletion(db, paper)
     db.delete(paper)
     db.commit()
 
+    publish_event("paper.deleted", {"paper_ids": [deleted_info["paper_id"]]}, admin_only=True)
+    publish_event("dataset.changed", {
+        "reason": "delete",
+        "paper_ids": [deleted_info["paper_id"]],
+        "chart": in_chart
+    })
+
     return {
         "message": f"文献《{deleted_info['title']}》已删除",
         "deleted_info": deleted_info
@@ -776,8 +803,21 @@ async def batch_review_papers(
             paper.reviewed_at = datetime.utcnow()
         reviewed_count += 1
 
+    reviewed_ids = [paper.id for paper in papers]
+    in_chart = any(paper.show_in_chart for paper in papers)
     db.commit()
 
+    publish_event("paper.reviewed", {
+        "paper_ids": reviewed_ids,
+        "status": request.status,
+        "reviewer": current_user.real_name
+    }, admin_only=True)
+    publish_event("dataset.changed", {
+        "reason": "review",
+        "paper_ids": reviewed_ids,
+        "chart": in_chart
+    })
+
     return {
         "message": f"批量更新完成，已将 {reviewed_count} 篇文献设为 {request.status}",
         "reviewed_count": reviewed_count,
@@ -811,8 +851,15 @@ async def batch_chart_visibility(
     for paper in papers:
         paper.show_in_chart = request.show
 
+    updated_ids = [paper.id for paper in papers]
     db.commit()
 
+    publish_event("dataset.changed", {
+        "reason": "chart_visibility",
+        "paper_ids": updated_ids,
+        "chart": True
+    })
+
     visibility_text = "显示" if request.show else "隐藏"
     return {
         "message": f"已将 {len(papers)} 篇文献设置为 {visibility_text}",
@@ -849,16 +896,26 @@ async def batch_delete_papers(
 
     # 记录删除信息
     deleted_papers = []
+    in_chart = any(paper.show_in_chart for paper in papers)
     for paper in papers:
         deleted_papers.append({
             "paper_id": paper.id,
             "doi": paper.doi,
             "title": paper.title
         })
+        crud.record_paper_deletion(db, paper)
         db.delete(paper)
 
     db.commit()
 
+    deleted_ids = [item["paper_id"] for item in deleted_papers]
+    publish_event("paper.deleted", {"paper_ids": deleted_ids}, admin_only=True)
+    publish_event("dataset.changed", {
+        "reason": "delete",
+        "paper_ids": deleted_ids,
+        "chart": in_chart
+    })
+
     return {
         "message": f"批量删除完成",
         "deleted_count": len(deleted_papers),
@@ -868,6 +925,44 @@ async def batch_delete_papers(
     }
 
 
+# ========== 存储空间维护 ==========
+
+@router.get("/storage/report", summary="数据库空间报告（仅超级管理员）")
+def get_storage_report(current_user: User = Depends(get_current_superadmin)):
+    """
+    返回数据库页数、空闲页、auto_vacuum 模式及各表/索引的字节占用
+    """
+    return compact_db.storage_report()
+
+
+@router.post("/storage/compact", summary="分步回收数据库空闲页（仅超级管理员）")
+def compact_storage(
+    max_steps: int = Query(20, ge=1, le=500),
+    current_user: User = Depends(get_current_superadmin)
+):
+    """
+    执行有限步数的 incremental_vacuum，每步只短暂持有写锁
+
+    数据库需先用 python -m backend.compact_db --enable-incremental 切换为增量回收模式
+    """
+    try:
+        result = compact_db.incremental_vacuum(max_steps=max_steps)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    result["report"] = compact_db.storage_report()
+    return result
+
+
+# ========== DOI 解析状态 ==========
+
+@router.get("/doi/stats", summary="CrossRef 请求计数与熔断状态（仅超级管理员）")
+def get_doi_resolver_stats(current_user: User = Depends(get_current_superadmin)):
+    """
+    返回 DOI 解析的调用次数、实际请求数、重试次数、失败次数、被熔断拒绝的次数，以及熔断器状态
+    """
+    return doi_resolver.stats()
+
+
 # ========== 图片管理功能 ==========
 
 from backend.models import PaperImage
@@ -893,17 +988,22 @@ async def get_paper_images(
             detail="文献不存在"
         )
 
+    # 只读取元数据列（二进制列为延迟加载）
+    images = crud.get_paper_images(db, paper_id)
+
     return {
         "paper_id": paper.id,
-        "total_images": len(paper.images),
+        "total_images": len(images),
         "images": [
             {
                 "id": img.id,
                 "order": img.image_order,
                 "file_size": img.file_size,
+                "image_hash": img.image_hash,
+                "thumbnail_hash": img.thumbnail_hash,
                 "created_at": img.created_at.isoformat()
             }
-            for img in sorted(paper.images, key=lambda x: x.image_order)
+            for img in images
         ]
     }
 
@@ -931,9 +1031,9 @@ async def delete_paper_image(
             detail="图片不存在"
         )
 
-    # 获取文献的所有图片
-    paper = db.query(Paper).filter(Paper.id == paper_id).first()
-    if len(paper.images) <= 1:
+    # 获取文献的图片数量
+    image_count = crud.get_paper_image_count(db, paper_id)
+    if image_count <= 1:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="至少需要保留一张图片"
@@ -956,5 +1056,5 @@ async def delete_paper_image(
     return {
         "message": "图片已删除",
         "deleted_image_id": image_id,
-        "remaining_images": len(paper.images) - 1
+        "remaining_images": image_count - 1
     }
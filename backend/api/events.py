@@ -0,0 +1,110 @@
+"""
+实时事件推送 API（Server-Sent Events）
+"""
+import asyncio
+import time
+from datetime import timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+
+from backend.database import SessionLocal
+from backend.models import User
+from backend.security import create_access_token, decode_access_token, get_current_admin
+from backend.utils.event_broadcaster import event_broadcaster, format_sse
+
+router = APIRouter(prefix="/api/events", tags=["events"])
+
+# 心跳间隔（秒）：防止代理因空闲断开长连接；同时按此间隔复查管理员权限
+HEARTBEAT_INTERVAL = 15
+# 订阅票据有效期（秒）：票据出现在 URL 中，只用于建立连接，过期后需重新申请
+STREAM_TICKET_EXPIRE_SECONDS = 60
+STREAM_TICKET_PURPOSE = "event_stream"
+
+
+def _is_approved_admin(email: str) -> bool:
+    """查询用户当前是否为已批准的管理员"""
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.email == email).first()
+        return bool(user and user.is_admin and user.is_approved)
+    finally:
+        db.close()
+
+
+def _ticket_email(ticket: str) -> Optional[str]:
+    """校验订阅票据，返回其所属用户邮箱"""
+    payload = decode_access_token(ticket)
+    if not payload or payload.get("purpose") != STREAM_TICKET_PURPOSE:
+        return None
+    return payload.get("sub")
+
+
+@router.post("/ticket")
+async def create_stream_ticket(current_user: User = Depends(get_current_admin)):
+    """
+    申请事件订阅票据（仅管理员）
+
+    EventSource 无法设置请求头，只能把凭证放在 URL 中；这里签发只能用于订阅、
+    有效期很短的票据，避免长期有效的访问令牌出现在访问日志和浏览历史里。
+    """
+    ticket = create_access_token(
+        {"sub": current_user.email, "purpose": STREAM_TICKET_PURPOSE},
+        expires_delta=timedelta(seconds=STREAM_TICKET_EXPIRE_SECONDS)
+    )
+    return {"ticket": ticket, "expires_in": STREAM_TICKET_EXPIRE_SECONDS}
+
+
+@router.get("/stream")
+async def event_stream(request: Request, ticket: Optional[str] = None):
+    """
+    订阅实时事件
+
+    管理员先通过 POST /api/events/ticket 申请票据，再以 ?ticket= 连接以接收审核相关事件；
+    连接期间按心跳间隔复查管理员权限，失去权限时关闭连接。
+    未携带票据的连接只会收到公开的数据集变更事件（dataset.changed）。
+
+    事件类型:
+    - paper.created / paper.reviewed / paper.deleted: 文献上传、审核、删除（仅管理员）
+    - dataset.changed: 公开数据集发生变化，chart=true 表示图表数据受影响
+    """
+    email = None
+    if ticket:
+        email = _ticket_email(ticket)
+        if not email or not await run_in_threadpool(_is_approved_admin, email):
+            # 票据过期或权限已失效：返回错误，由前端重新申请票据
+            raise HTTPException(status_code=401, detail="订阅票据无效或已过期")
+    queue = event_broadcaster.subscribe()
+
+    async def generate():
+        checked_at = time.monotonic()
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                if await request.is_disconnected():
+                    break
+                if email and time.monotonic() - checked_at >= HEARTBEAT_INTERVAL:
+                    if not await run_in_threadpool(_is_approved_admin, email):
+                        break
+                    checked_at = time.monotonic()
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield format_sse(comment="ping")
+                    continue
+                if event["admin_only"] and not email:
+                    continue
+                yield format_sse(event)
+        finally:
+            event_broadcaster.unsubscribe(queue)
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
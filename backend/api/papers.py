@@ -1,44 +1,50 @@
 """
 文献相关API
 """
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Response
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Response, Request, Query
 from fastapi.responses import StreamingResponse, FileResponse
+from starlette.background import BackgroundTask
+from anyio.from_thread import run as run_from_thread
 from sqlalchemy.orm import Session
 from typing import List, Optional, Annotated
 import json
-from io import BytesIO
+import base64
+import asyncio
 from pathlib import Path
+from datetime import datetime, timedelta
 
-from backend.database import get_db
+from backend.database import get_db, SessionLocal
 from backend import crud, schemas
-from backend.utils.doi_resolver import get_doi_metadata, validate_doi
+from backend.utils.doi_resolver import lookup_doi, lookup_dois, normalize_doi, DOILookup
 from backend.utils.citation import generate_aps_citation, generate_bibtex_citation
-from backend.utils.image_processor import process_image, validate_image as validate_image_util
+from backend.utils.superconductor_types import normalize_superconductor_type
+from backend.utils.image_processor import (
+    image_processor, process_image_async, run_in_image_pool,
+    ImageProcessingBusy, ImageProcessingTimeout, ImageProcessingCrashed
+)
+from backend.utils.image_renditions import (
+    rendition_store, resize_cache, negotiate_format, snap_width, detect_format,
+    encode_rendition, encode_resized, MEDIA_TYPES, SUPPORTED_FORMATS
+)
+from backend.utils.event_broadcaster import publish_event
+from backend.utils.image_storage import image_storage, content_hash
+from backend.utils.http_cache import cache_headers, is_not_modified, version_matches
+from backend.utils.http_range import range_response, read_file_range
+from backend.utils.upload_limits import (
+    read_upload, check_upload_size, MAX_IMAGE_UPLOAD_BYTES, MAX_BATCH_UPLOAD_BYTES
+)
 
 from backend.security import (
     get_current_user,
     get_current_admin
 )
 
-SUPERCONDUCTOR_TYPES = {"cuprate", "iron_based", "nickel_based", "hydride", "carbon", "organic", "others"}
-LEGACY_SC_TYPE_MAP = {
-    "carbon_organic": "carbon",
-    "conventional": "others",
-    "other_conventional": "others",
-    "unconventional": "others",
-    "other_unconventional": "others",
-    "unknown": "others"
-}
-
+router = APIRouter(prefix="/api/papers", tags=["papers"])
 
-def normalize_superconductor_type(value: str) -> str:
-    """兼容旧数据：将历史分类映射到七大类"""
-    if not value:
-        return "others"
-    normalized = LEGACY_SC_TYPE_MAP.get(value, value)
-    return normalized if normalized in SUPERCONDUCTOR_TYPES else "others"
+SYNC_EPOCH = datetime(1970, 1, 1)
 
-router = APIRouter(prefix="/api/papers", tags=["papers"])
+# 纪录 Tc 时间线缓存：{"version": 数据版本, "payload": 计算结果}
+_record_tc_cache = {"version": None, "payload": None}
 
 
 @router.get("/stats/user-ranking")
@@ -112,16 +118,15 @@ async def create_paper(
     metadata = None
 
     if not is_admin:
-        print(f"正在验证DOI: {doi}")
-        is_valid = await validate_doi(doi)
-        if not is_valid:
+        # 一次查询同时完成验证和元数据获取
+        print(f"正在验证DOI并获取元数据: {doi}")
+        lookup = await lookup_doi(doi)
+        if lookup.status == DOILookup.NOT_FOUND:
             raise HTTPException(
                 status_code=400,
                 detail=f"DOI {doi} 无效或不存在，请检查格式"
             )
-
-        print(f"正在获取DOI元数据...")
-        metadata = await get_doi_metadata(doi)
+        metadata = lookup.metadata
         if not metadata:
             raise HTTPException(
                 status_code=500,
@@ -130,7 +135,7 @@ async def create_paper(
     else:
         # 管理员尝试获取元数据，但如果失败则使用占位符
         print(f"管理员上传，跳过强制DOI验证...")
-        metadata = await get_doi_metadata(doi)
+        metadata = (await lookup_doi(doi)).metadata
         if not metadata:
             print("无法获取元数据，使用占位符...")
             metadata = {
@@ -151,6 +156,26 @@ async def create_paper(
             detail=f"文献 {doi} 已存在于 {compound.element_symbols} 系统中"
         )
 
+    # 5.1 并行处理截图（在进程池中执行，不阻塞事件循环；写入数据库前完成，失败不会留下半条记录）
+    raw_images = [
+        await read_upload(image_file, MAX_IMAGE_UPLOAD_BYTES, f"图片 {image_file.filename} ")
+        for image_file in images_to_process
+    ]
+    results = await asyncio.gather(
+        *[process_image_async(image_data) for image_data in raw_images],
+        return_exceptions=True
+    )
+    processed_images = []
+    for image_file, result in zip(images_to_process, results):
+        if isinstance(result, (ImageProcessingBusy, ImageProcessingTimeout, ImageProcessingCrashed)):
+            raise HTTPException(status_code=503, detail=str(result))
+        if isinstance(result, Exception):
+            raise HTTPException(
+                status_code=400,
+                detail=f"图片 {image_file.filename} 处理失败: {str(result)}"
+            )
+        processed_images.append(result)
+
     # 6. 生成引用格式
     authors_list = metadata.get("authors", [])
     title = metadata.get("title", "")
@@ -170,69 +195,96 @@ async def create_paper(
     # 优先使用登录用户的真实姓名作为贡献者
     final_contributor_name = current_user.real_name if current_user else (contributor_name or "匿名贡献者")
 
-    paper = crud.create_paper(
-        db=db,
-        compound_id=compound.id,
-        doi=doi,
-        title=title,
-        article_type=article_type,
-        superconductor_type=superconductor_type,
-        authors=json.dumps(authors_list, ensure_ascii=False),
-        journal=journal,
-        volume=volume,
-        pages=pages,
-        year=year,
-        abstract=metadata.get("abstract", ""),
-        citation_aps=citation_aps,
-        citation_bibtex=citation_bibtex,
-        chemical_formula=chemical_formula,
-        crystal_structure=crystal_structure,
-        contributor_name=final_contributor_name,
-        contributor_affiliation=contributor_affiliation or "未提供单位",
-        notes=notes
-    )
-
-    # 8. 保存物理数据点
-    crud.create_paper_data(db=db, paper_id=paper.id, data_list=data_list)
-
-    # 9. 处理并保存截图
-    for idx, image_file in enumerate(images_to_process, start=1):
-        # 读取图片数据
-        image_data = await image_file.read()
+    # 7-9 在同一个事务中完成：任何一步失败都不会留下缺少数据或截图的半条文献
+    try:
+        paper = crud.create_paper(
+            db=db,
+            compound_id=compound.id,
+            doi=doi,
+            title=title,
+            article_type=article_type,
+            superconductor_type=superconductor_type,
+            authors=json.dumps(authors_list, ensure_ascii=False),
+            journal=journal,
+            volume=volume,
+            pages=pages,
+            year=year,
+            abstract=metadata.get("abstract", ""),
+            citation_aps=citation_aps,
+            citation_bibtex=citation_bibtex,
+            chemical_formula=chemical_formula,
+            crystal_structure=crystal_structure,
+            contributor_name=final_contributor_name,
+            contributor_affiliation=contributor_affiliation or "未提供单位",
+            notes=notes,
+            commit=False
+        )
 
-        # 验证图片
-        if not validate_image_util(image_data):
-            raise HTTPException(
-                status_code=400,
-                detail=f"图片 {image_file.filename} 无效或损坏"
-            )
+        # 8. 保存物理数据点
+        crud.create_paper_data(db=db, paper_id=paper.id, data_list=data_list, commit=False)
 
-        # 处理图片（生成压缩图和缩略图）
-        try:
-            compressed_data, thumbnail_data = process_image(image_data)
-        except Exception as e:
-            raise HTTPException(
-                status_code=400,
-                detail=f"图片处理失败: {str(e)}"
+        # 9. 保存截图
+        for idx, (compressed_data, thumbnail_data, phash) in enumerate(processed_images, start=1):
+            crud.create_paper_image(
+                db=db,
+                paper_id=paper.id,
+                image_data=compressed_data,
+                thumbnail_data=thumbnail_data,
+                image_order=idx,
+                file_size=len(compressed_data),
+                perceptual_hash=phash,
+                rendition_version=image_processor.rendition_version,
+                commit=False
             )
 
-        # 保存到数据库
-        crud.create_paper_image(
-            db=db,
-            paper_id=paper.id,
-            image_data=compressed_data,
-            thumbnail_data=thumbnail_data,
-            image_order=idx,
-            file_size=len(compressed_data)
-        )
-
-    # 9. 返回响应
+        db.commit()
+        db.refresh(paper)
+    except Exception:
+        db.rollback()
+        raise
+
+    publish_event("paper.created", {
+        "paper_id": paper.id,
+        "doi": paper.doi,
+        "title": paper.title,
+        "contributor_name": paper.contributor_name,
+        "review_status": paper.review_status
+    }, admin_only=True)
+    publish_event("dataset.changed", {
+        "reason": "create",
+        "paper_ids": [paper.id],
+        "chart": bool(paper.show_in_chart)
+    })
+
+    # 10. 返回响应
     paper_response = schemas.PaperResponse.from_orm(paper)
     paper_response.image_count = len(images_to_process)
 
     return paper_response
 
 
+def _parse_batch_file(upload: UploadFile):
+    """
+    直接从上传的临时文件逐行读取、校验，不把整个文件内容或原始行读入内存；
+    校验通过的行会全部收集起来，供后续 DOI 解析和批量写入使用（内存占用仍与有效行数成正比）
+
+    Returns:
+        (文献列表, id_temp -> 物理数据列表, 校验失败的行结果)
+    """
+    from backend.merge_csv import iter_file_rows, iter_records
+
+    papers = []
+    data_points = {}
+    outcomes = []
+    for kind, item, points in iter_records(iter_file_rows(upload.file, upload.filename)):
+        if kind == "error":
+            outcomes.append({**item, "status": "invalid"})
+        else:
+            papers.append(item)
+            data_points[item["id_temp"]] = points
+    return papers, data_points, outcomes
+
+
 @router.post("/batch-upload")
 async def batch_upload_papers(
     file: UploadFile = File(...),
@@ -245,60 +297,69 @@ async def batch_upload_papers(
     if not current_user:
         raise HTTPException(status_code=401, detail="请先登录后再进行批量上传")
     
-    from backend.merge_csv import process_file
-    
+    check_upload_size(file, MAX_BATCH_UPLOAD_BYTES, "上传文件")
     try:
-        content = await file.read()
-        added_p, added_d, fragment = process_file(content, file.filename)
-        
-        # 将 fragment 中的数据存入数据库
-        # 注意：这里需要处理化合物创建和 ID 关联
-        temp_to_real_paper_ids = {}
-        
-        # 1. 处理文献
-        for p_data in fragment["papers"]:
-            # 获取或创建化合物
-            element_list = p_data["element_symbols"].split("-")
-            compound = crud.get_or_create_compound(db, element_list)
-            
-            # 检查 DOI 是否已存在
-            if crud.check_paper_exists(db, compound.id, p_data["doi"]):
-                continue
-                
-            # 创建文献
-            paper = crud.create_paper(
-                db=db,
-                compound_id=compound.id,
-                doi=p_data["doi"],
-                title=p_data["title"],
-                article_type=p_data["article_type"],
-                superconductor_type=p_data["superconductor_type"],
-                authors=p_data["authors"],
-                journal=p_data["journal"],
-                year=p_data["year"],
-                chemical_formula=p_data.get("chemical_formula"),
-                crystal_structure=p_data.get("crystal_structure"),
-                contributor_name=current_user.real_name,
-                contributor_affiliation="Batch Upload"
-            )
-            temp_to_real_paper_ids[p_data["id_temp"]] = paper.id
-            
-        # 2. 处理物理数据
-        for d_data in fragment["paper_data"]:
-            real_paper_id = temp_to_real_paper_ids.get(d_data["paper_id_temp"])
-            if not real_paper_id:
+        # 0. 流式解析（在线程池中执行，不阻塞事件循环）
+        papers, data_points, outcomes = await asyncio.get_running_loop().run_in_executor(
+            None, _parse_batch_file, file
+        )
+
+        # 1. 预检查：一次性加载元素组合和已有的 (compound_id, doi)，跳过重复行
+        candidates, skipped = crud.plan_bulk_papers(db, papers)
+        outcomes += skipped
+        # 预检查只读，结束读事务，DOI 解析期间不占用数据库
+        db.rollback()
+
+        # 2. 并发、限速地解析所有新文献的 DOI，用真实元数据替换占位信息
+        lookups = await lookup_dois(p_data["doi"] for p_data in candidates)
+        resolved = 0
+        for p_data in candidates:
+            doi = p_data["doi"]
+            p_data["contributor_name"] = current_user.real_name
+            p_data["contributor_affiliation"] = "Batch Upload"
+            metadata = lookups.get(normalize_doi(doi), DOILookup(DOILookup.ERROR)).metadata
+            if not metadata:
                 continue
-                
-            # 清理掉临时 ID
-            d_save = {k: v for k, v in d_data.items() if k != "paper_id_temp"}
-            crud.create_paper_data(db, real_paper_id, [d_save])
-            
+            authors_list = metadata.get("authors", [])
+            p_data["title"] = metadata.get("title") or p_data["title"]
+            p_data["authors"] = json.dumps(authors_list, ensure_ascii=False)
+            p_data["journal"] = metadata.get("journal") or p_data.get("journal")
+            p_data["volume"] = metadata.get("volume", "")
+            p_data["pages"] = metadata.get("pages", "")
+            p_data["year"] = metadata.get("year") or p_data["year"]
+            p_data["abstract"] = metadata.get("abstract", "")
+            args = (authors_list, p_data["title"], p_data["journal"], p_data["volume"],
+                    p_data["pages"], p_data["year"], doi)
+            p_data["citation_aps"] = generate_aps_citation(*args)
+            p_data["citation_bibtex"] = generate_bibtex_citation(*args)
+            resolved += 1
+
+        # 3. 新元素组合、文献、物理数据在一个事务中批量插入
+        created_ids = crud.bulk_create_papers(db, candidates, data_points)
+        added_points = 0
+        for p_data, paper_id in zip(candidates, created_ids):
+            points = len(data_points[p_data["id_temp"]])
+            added_points += points
+            outcomes.append({
+                "row": p_data.get("row"), "doi": p_data["doi"], "status": "created",
+                "paper_id": paper_id, "data_points": points,
+                "metadata_resolved": bool(p_data.get("citation_aps"))
+            })
+        outcomes.sort(key=lambda item: item.get("row") or 0)
+
+        if created_ids:
+            publish_event("paper.created", {"paper_ids": created_ids, "batch": True}, admin_only=True)
+            publish_event("dataset.changed", {"reason": "create", "paper_ids": created_ids, "chart": False})
+
         return {
-            "message": f"批量处理完成！成功导入 {len(temp_to_real_paper_ids)} 篇新文献。",
-            "added_papers": len(temp_to_real_paper_ids),
-            "added_data_points": added_d
+            "message": f"批量处理完成！成功导入 {len(created_ids)} 篇新文献。",
+            "added_papers": len(created_ids),
+            "resolved_metadata": resolved,
+            "added_data_points": added_points,
+            "skipped_rows": len(outcomes) - len(created_ids),
+            "rows": outcomes
         }
-        
+
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"文件处理失败: {str(e)}")
 
@@ -372,6 +433,7 @@ def get_papers_by_compound(
     papers = crud.get_papers_by_compound(db, compound.id, search_params)
 
     # 添加图片数量和审核人姓名
+    image_counts = crud.get_paper_image_counts(db, [paper.id for paper in papers])
     papers_with_count = []
     for paper in papers:
         paper_resp = schemas.PaperResponse.from_orm(paper)
@@ -380,7 +442,7 @@ def get_papers_by_compound(
             paper_resp.reviewer_name = paper.reviewer.real_name
         else:
             paper_resp.reviewer_name = None
-        paper_resp.image_count = crud.get_paper_image_count(db, paper.id)
+        paper_resp.image_count = image_counts.get(paper.id, 0)
         papers_with_count.append(paper_resp)
 
     return papers_with_count
@@ -398,6 +460,109 @@ def get_crystal_structures(db: Session = Depends(get_db)):
     return structures
 
 
+def _encode_sync_token(moment: datetime) -> str:
+    """同步令牌：UTC 时间点的微秒时间戳（对客户端不透明）"""
+    return str(int((moment - SYNC_EPOCH).total_seconds() * 1_000_000))
+
+
+def _decode_sync_token(token: str) -> datetime:
+    try:
+        return SYNC_EPOCH + timedelta(microseconds=int(token))
+    except (TypeError, ValueError, OverflowError):
+        raise HTTPException(status_code=400, detail="无效的同步令牌，请不带 since 参数重新全量同步")
+
+
+@router.get("/sync")
+def sync_papers(since: Optional[str] = None, db: Session = Depends(get_db)):
+    """
+    增量同步文献与物理数据
+
+    不带 since 时返回全量快照；之后把响应中的 token 作为下一次的 since，
+    只返回该时间点之后新增/修改/删除的记录。
+    客户端应先应用 deleted_* 再按ID覆盖写入 papers / paper_data（重复下发的记录是幂等的）。
+    """
+    since_time = _decode_sync_token(since) if since else None
+    # 令牌取查询开始前的时间，查询期间发生的修改会在下一次同步中返回
+    token = _encode_sync_token(datetime.utcnow())
+
+    changes = crud.get_sync_changes(db, since_time)
+    return {
+        "token": token,
+        "full": since_time is None,
+        **changes
+    }
+
+
+# 单次批量请求最多包含的文献数
+MAX_THUMBNAIL_BATCH = 200
+
+
+@router.get("/thumbnails")
+def get_first_thumbnails(
+    request: Request,
+    ids: str = Query(..., description="逗号分隔的文献ID"),
+    db: Session = Depends(get_db)
+):
+    """
+    批量获取多篇文献第一张截图的缩略图（列表页一次请求取回全部缩略图）
+
+    返回 NDJSON，每行一张：{"paper_id", "image_id", "hash", "media_type", "data"(base64)}；
+    没有截图的文献不出现在结果中。整体 ETag 由各缩略图哈希组合而成，未变化时返回 304。
+    缺少哈希的旧截图在内存中按内容计算哈希，不在 GET 请求中写库
+    （持久化请运行 python -m backend.migrate_images --hashes）。
+    """
+    try:
+        paper_ids = list(dict.fromkeys(int(x) for x in ids.split(",") if x.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids 必须是逗号分隔的整数")
+    if len(paper_ids) > MAX_THUMBNAIL_BATCH:
+        raise HTTPException(status_code=400, detail=f"单次最多请求 {MAX_THUMBNAIL_BATCH} 篇文献")
+
+    metas = crud.get_first_image_metas(db, paper_ids)
+
+    # 缺少哈希的旧截图：一次查询读取 BLOB，用读到的内容计算哈希（后面直接复用，不再读第二次）
+    blobs = crud.read_thumbnail_blobs(db, [meta.id for meta in metas if not meta.thumbnail_hash])
+    hashes = {
+        meta.id: meta.thumbnail_hash or (content_hash(blobs[meta.id]) if meta.id in blobs else None)
+        for meta in metas
+    }
+
+    digest = content_hash(
+        ",".join(f"{meta.paper_id}:{hashes[meta.id]}" for meta in metas).encode()
+    )
+    headers = cache_headers(digest)
+    if is_not_modified(request.headers, digest):
+        return Response(status_code=304, headers=headers)
+
+    # 文件仓库中的缩略图直接读文件，其余在一次查询中读取 BLOB
+    paths = {
+        meta.id: image_storage.files.locate(meta.thumbnail_hash) for meta in metas if meta.thumbnail_hash
+    }
+    blobs.update(crud.read_thumbnail_blobs(
+        db, [meta.id for meta in metas if meta.thumbnail_hash and not paths[meta.id]]
+    ))
+
+    lines = []
+    for meta in metas:
+        path = paths.get(meta.id)
+        data = path.read_bytes() if path else blobs.get(meta.id)
+        if not data:
+            continue
+        lines.append(json.dumps({
+            "paper_id": meta.paper_id,
+            "image_id": meta.id,
+            "hash": hashes[meta.id],
+            "media_type": MEDIA_TYPES[detect_format(data)],
+            "data": base64.b64encode(data).decode("ascii")
+        }))
+
+    return Response(
+        content="\n".join(lines) + ("\n" if lines else ""),
+        media_type="application/x-ndjson",
+        headers=headers
+    )
+
+
 @router.get("/{paper_id}", response_model=schemas.PaperDetail)
 def get_paper_detail(paper_id: int, db: Session = Depends(get_db)):
     """
@@ -417,11 +582,149 @@ def get_paper_detail(paper_id: int, db: Session = Depends(get_db)):
     return paper_detail
 
 
+# 正在后台生成的副本，避免同一张图被并发重复转码
+_pending_renditions = set()
+
+
+async def _generate_rendition(image_id: int, thumbnail: bool, digest: str, fmt: str):
+    """响应发送后在进程池中生成现代格式副本"""
+    key = (digest, fmt)
+    if key in _pending_renditions or rendition_store.exists(digest, fmt):
+        return
+    _pending_renditions.add(key)
+    try:
+        path = image_storage.files.locate(digest)
+        if path:
+            source = path.read_bytes()
+        else:
+            db = SessionLocal()
+            try:
+                source = crud.read_image_blob(db, image_id, thumbnail)
+            finally:
+                db.close()
+        if not source:
+            return
+        data = await run_in_image_pool(encode_rendition, source, fmt)
+        rendition_store.put(digest, fmt, data)
+    except (ImageProcessingBusy, ImageProcessingTimeout, ImageProcessingCrashed):
+        # 繁忙时放弃，下次请求再生成
+        pass
+    except Exception as e:
+        print(f"生成 {fmt} 副本失败 (image {image_id}): {e}")
+    finally:
+        _pending_renditions.discard(key)
+
+
+def _serve_image(db: Session, request: Request, meta, thumbnail: bool, version: Optional[str]):
+    """
+    返回截图响应
+
+    - ETag 命中时在读取图片二进制之前直接返回 304
+    - 按 Accept 头优先返回 AVIF/WebP 副本；副本未生成时返回 JPEG 并在后台生成
+    - 支持单段/多段 Range 请求，只读取请求的字节窗口
+    - 文件存储直接用 FileResponse 发送文件，数据库存储只读取所需的 BLOB 列
+    """
+    digest = meta.thumbnail_hash if thumbnail else meta.image_hash
+    if not digest:
+        # 旧数据没有哈希：首次读取时补算并保存
+        digest = crud.backfill_image_hash(db, meta.id, thumbnail)
+        if not digest:
+            raise HTTPException(status_code=404, detail="图片文件缺失")
+
+    fmt = negotiate_format(request.headers.get("accept"))
+    rendition_path = rendition_store.locate(digest, fmt) if fmt else None
+    background = None
+    if fmt and not rendition_path and not rendition_store.exists(digest, fmt):
+        background = BackgroundTask(_generate_rendition, meta.id, thumbnail, digest, fmt)
+
+    # 不同格式是同一资源的不同表示，ETag 需要区分
+    etag_digest = f"{digest}.{fmt}" if rendition_path else digest
+    media_type = MEDIA_TYPES[fmt] if rendition_path else "image/jpeg"
+    headers = cache_headers(etag_digest, meta.created_at, version_matches(version, digest))
+    headers["Accept-Ranges"] = "bytes"
+    if SUPPORTED_FORMATS:
+        headers["Vary"] = "Accept"
+    if is_not_modified(request.headers, etag_digest, meta.created_at):
+        return Response(status_code=304, headers=headers, background=background)
+
+    path = rendition_path or image_storage.files.locate(digest)
+    if path:
+        size = path.stat().st_size
+        read = lambda start, length: read_file_range(path, start, length)
+    else:
+        size = crud.get_image_blob_size(db, meta.id, thumbnail)
+        if not size:
+            raise HTTPException(status_code=404, detail="图片文件缺失")
+        read = lambda start, length: crud.read_image_blob(db, meta.id, thumbnail, start, length)
+
+    partial = range_response(request.headers, size, read, media_type, headers)
+    if partial:
+        partial.background = background
+        return partial
+
+    if path:
+        return FileResponse(path, media_type=media_type, headers=headers, background=background)
+    return Response(
+        content=crud.read_image_blob(db, meta.id, thumbnail),
+        media_type=media_type,
+        headers=headers,
+        background=background
+    )
+
+
+def _serve_resized(db: Session, request: Request, meta, width: int, version: Optional[str]):
+    """
+    返回按宽度缩放的截图（宽度取整到允许档位，结果保存在 LRU 磁盘缓存中）
+
+    原图不比目标宽度大时直接返回原图
+    """
+    digest = meta.image_hash or crud.backfill_image_hash(db, meta.id, False)
+    if not digest:
+        raise HTTPException(status_code=404, detail="图片文件缺失")
+
+    width = snap_width(width)
+    fmt = negotiate_format(request.headers.get("accept")) or "jpeg"
+    etag_digest = f"{digest}.w{width}.{fmt}"
+    headers = cache_headers(etag_digest, meta.created_at, version_matches(version, digest))
+    headers["Accept-Ranges"] = "bytes"
+    headers["Vary"] = "Accept"
+    if is_not_modified(request.headers, etag_digest, meta.created_at):
+        return Response(status_code=304, headers=headers)
+
+    path = resize_cache.get(digest, width, fmt)
+    if path is None:
+        source_path = image_storage.files.locate(digest)
+        source = source_path.read_bytes() if source_path else crud.read_image_blob(db, meta.id, False)
+        if not source:
+            raise HTTPException(status_code=404, detail="图片文件缺失")
+        try:
+            # 在线程池中运行：回到事件循环，交给图片进程池（共享背压与超时）
+            data = run_from_thread(run_in_image_pool, encode_resized, source, width, fmt)
+        except (ImageProcessingBusy, ImageProcessingTimeout, ImageProcessingCrashed) as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        path = resize_cache.put(digest, width, fmt, data)
+
+    if path.stat().st_size == 0:
+        return _serve_image(db, request, meta, False, version)
+
+    size = path.stat().st_size
+    partial = range_response(
+        request.headers, size, lambda start, length: read_file_range(path, start, length),
+        MEDIA_TYPES[fmt], headers
+    )
+    if partial:
+        return partial
+    return FileResponse(path, media_type=MEDIA_TYPES[fmt], headers=headers)
+
+
 @router.get("/{paper_id}/images/{image_order}")
 def get_paper_image(
     paper_id: int,
     image_order: int,
+    request: Request,
     thumbnail: bool = False,
+    v: Optional[str] = None,
+    width: Optional[int] = Query(None, ge=1, le=4096),
     db: Session = Depends(get_db)
 ):
     """
@@ -431,25 +734,25 @@ def get_paper_image(
         paper_id: 文献ID
         image_order: 图片顺序 (1-5)
         thumbnail: 是否返回缩略图（默认False返回原图）
+        v: 内容版本（图片哈希），与当前内容一致时返回长期不可变缓存头
+        width: 目标宽度（取整到允许档位，如 320/640/960/1280），指定时忽略 thumbnail
     """
-    image = crud.get_image_by_order(db, paper_id, image_order)
-    if not image:
+    meta = crud.get_image_meta_by_order(db, paper_id, image_order)
+    if not meta:
         raise HTTPException(status_code=404, detail="图片不存在")
 
-    # 选择原图或缩略图
-    image_data = image.thumbnail_data if thumbnail else image.image_data
-
-    # 返回图片
-    return StreamingResponse(
-        BytesIO(image_data),
-        media_type="image/jpeg"
-    )
+    if width:
+        return _serve_resized(db, request, meta, width, v)
+    return _serve_image(db, request, meta, thumbnail, v)
 
 
 @router.get("/images/{image_id}")
 def get_image_by_id(
     image_id: int,
+    request: Request,
     thumbnail: bool = False,
+    v: Optional[str] = None,
+    width: Optional[int] = Query(None, ge=1, le=4096),
     db: Session = Depends(get_db)
 ):
     """
@@ -458,19 +761,16 @@ def get_image_by_id(
     Args:
         image_id: 图片ID
         thumbnail: 是否返回缩略图
+        v: 内容版本（图片哈希），与当前内容一致时返回长期不可变缓存头
+        width: 目标宽度（取整到允许档位，如 320/640/960/1280），指定时忽略 thumbnail
     """
-    image = crud.get_image_by_id(db, image_id)
-    if not image:
+    meta = crud.get_image_meta_by_id(db, image_id)
+    if not meta:
         raise HTTPException(status_code=404, detail="图片不存在")
 
-    # 选择原图或缩略图
-    image_data = image.thumbnail_data if thumbnail else image.image_data
-
-    # 返回图片
-    return StreamingResponse(
-        BytesIO(image_data),
-        media_type="image/jpeg"
-    )
+    if width:
+        return _serve_resized(db, request, meta, width, v)
+    return _serve_image(db, request, meta, thumbnail, v)
 
 
 @router.post("/export")
@@ -535,3 +835,108 @@ def get_chart_data(db: Session = Depends(get_db)):
                     "sc_type": normalized_sc_type
                 })
     return result
+
+
+@router.get("/stats/dataset")
+def export_dataset(
+    format: str = "parquet",
+    chart_only: bool = False
+):
+    """
+    导出 papers + paper_data 联表数据集（Arrow IPC stream 或 Parquet）
+
+    Args:
+        format: parquet 或 arrow
+        chart_only: 仅导出在图表中显示的文献
+    """
+    from backend.export_arrow import (
+        iter_dataset_batches, stream_arrow_ipc, stream_parquet,
+        ARROW_STREAM_MEDIA_TYPE, PARQUET_MEDIA_TYPE
+    )
+
+    if format == "parquet":
+        writer, media_type, filename = stream_parquet, PARQUET_MEDIA_TYPE, "dataset.parquet"
+    elif format == "arrow":
+        writer, media_type, filename = stream_arrow_ipc, ARROW_STREAM_MEDIA_TYPE, "dataset.arrows"
+    else:
+        raise HTTPException(status_code=400, detail="format 必须是 parquet 或 arrow")
+
+    def generate():
+        # 流式响应期间依赖注入的会话已关闭，这里自行管理会话
+        db = SessionLocal()
+        try:
+            yield from writer(iter_dataset_batches(db, chart_only=chart_only))
+        finally:
+            db.close()
+
+    return StreamingResponse(
+        generate(),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+
+def _build_record_tc_timeline(db: Session) -> dict:
+    """
+    一次有序扫描 papers/paper_data 联表，计算逐年纪录 Tc（累计最大值）
+
+    同一年内按 Tc 降序排列，因此每年每个分组最多产生一个纪录点
+    """
+    from backend.models import Paper, PaperData
+
+    rows = db.query(
+        Paper.id, Paper.year, Paper.doi, Paper.title, Paper.chemical_formula,
+        Paper.article_type, Paper.superconductor_type, PaperData.tc, PaperData.pressure
+    ).join(PaperData, PaperData.paper_id == Paper.id).filter(
+        Paper.show_in_chart == True,
+        Paper.year.isnot(None),
+        PaperData.tc.isnot(None)
+    ).order_by(Paper.year.asc(), PaperData.tc.desc(), Paper.id.asc())
+
+    overall = []
+    by_sc_type = {}
+    by_article_type = {}
+    maxima = {}
+
+    for paper_id, year, doi, title, formula, article_type, sc_type, tc, pressure in rows.yield_per(1000):
+        step = None
+        sc_type = normalize_superconductor_type(sc_type)
+        for key, steps in (
+            ("overall", overall),
+            (("sc", sc_type), by_sc_type.setdefault(sc_type, [])),
+            (("article", article_type), by_article_type.setdefault(article_type, [])),
+        ):
+            if tc > maxima.get(key, float("-inf")):
+                maxima[key] = tc
+                if step is None:
+                    step = {
+                        "year": year,
+                        "tc": tc,
+                        "pressure": pressure,
+                        "paper_id": paper_id,
+                        "doi": doi,
+                        "label": formula or title[:20],
+                        "type": article_type,
+                        "sc_type": sc_type
+                    }
+                steps.append(step)
+
+    return {
+        "overall": overall,
+        "by_superconductor_type": by_sc_type,
+        "by_article_type": by_article_type
+    }
+
+
+@router.get("/stats/record-tc")
+def get_record_tc_timeline(db: Session = Depends(get_db)):
+    """
+    获取逐年纪录 Tc 时间线（总体、按超导体类型、按文章类型）
+
+    每个纪录点附带创造该纪录的文献；结果按数据版本缓存，数据变化后自动重算
+    """
+    version = crud.get_data_version(db)
+    if _record_tc_cache["version"] != version:
+        _record_tc_cache["payload"] = _build_record_tc_timeline(db)
+        _record_tc_cache["version"] = version
+    return _record_tc_cache["payload"]
@@ -0,0 +1,170 @@
+"""
+数据库空间报告与压缩
+
+删除文献会级联删除 paper_images 中的 BLOB，但 SQLite 只把释放的页放入空闲列表，数据库文件不会缩小。
+- 报告：页大小、空闲页数、各表/索引占用字节（来自 dbstat 虚拟表）
+- 启用增量回收：切换为 auto_vacuum=INCREMENTAL（需要执行一次完整 VACUUM）
+- 增量回收：分步执行 PRAGMA incremental_vacuum(N)，每步只短暂持有写锁
+
+使用方法：
+python -m backend.compact_db                          # 打印空间报告
+python -m backend.compact_db --enable-incremental     # 切换为增量自动回收（执行一次 VACUUM，期间数据库不可写）
+python -m backend.compact_db --vacuum                 # 分步回收全部空闲页
+python -m backend.compact_db --vacuum --steps=20      # 最多执行 20 步
+"""
+import os
+import sys
+import time
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+
+from backend.database import engine, DATABASE_PATH
+from backend.utils.cli import get_option
+
+AUTO_VACUUM_MODES = {0: "none", 1: "full", 2: "incremental"}
+
+# 每步回收的页数（默认 4KB 页时约 8MB），以及步间休眠，让其他写入有机会获得锁
+VACUUM_PAGES_PER_STEP = int(os.environ.get("VACUUM_PAGES_PER_STEP", 2000))
+VACUUM_STEP_PAUSE = float(os.environ.get("VACUUM_STEP_PAUSE", 0.2))
+
+
+def _pragma(conn, name: str) -> int:
+    return conn.execute(text(f"PRAGMA {name}")).scalar()
+
+
+def storage_report(bind: Engine = engine) -> dict:
+    """
+    数据库空间使用报告
+
+    Returns:
+        包含 file_size、page_size、page_count、freelist_count、free_bytes、auto_vacuum、tables 的字典；
+        SQLite 未编译 dbstat 时 tables 为 None
+    """
+    with bind.connect() as conn:
+        page_size = _pragma(conn, "page_size")
+        page_count = _pragma(conn, "page_count")
+        freelist_count = _pragma(conn, "freelist_count")
+        auto_vacuum = _pragma(conn, "auto_vacuum")
+
+        try:
+            rows = conn.execute(text(
+                "SELECT name, COUNT(*) AS pages, SUM(pgsize) AS bytes, SUM(unused) AS unused "
+                "FROM dbstat GROUP BY name ORDER BY bytes DESC"
+            )).fetchall()
+            tables = [
+                {"name": name, "pages": pages, "bytes": size, "unused_bytes": unused}
+                for name, pages, size, unused in rows
+            ]
+        except OperationalError:
+            tables = None
+
+    return {
+        "file_size": os.path.getsize(DATABASE_PATH) if os.path.exists(DATABASE_PATH) else None,
+        "page_size": page_size,
+        "page_count": page_count,
+        "freelist_count": freelist_count,
+        "free_bytes": freelist_count * page_size,
+        "auto_vacuum": AUTO_VACUUM_MODES.get(auto_vacuum, str(auto_vacuum)),
+        "tables": tables,
+    }
+
+
+def enable_incremental_auto_vacuum(bind: Engine = engine) -> bool:
+    """
+    将数据库切换为 auto_vacuum=INCREMENTAL
+
+    已有数据库需要执行一次完整 VACUUM 才能生效（期间持有排他锁），建议在维护窗口执行
+
+    Returns:
+        True 表示本次进行了切换
+    """
+    with bind.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        if _pragma(conn, "auto_vacuum") == 2:
+            return False
+        conn.execute(text("PRAGMA auto_vacuum = INCREMENTAL"))
+        conn.execute(text("VACUUM"))
+        return _pragma(conn, "auto_vacuum") == 2
+
+
+def incremental_vacuum(
+    bind: Engine = engine,
+    pages_per_step: int = VACUUM_PAGES_PER_STEP,
+    max_steps: Optional[int] = None,
+    pause: float = VACUUM_STEP_PAUSE
+) -> dict:
+    """
+    分步回收空闲页
+
+    每步是一个独立的短事务，步与步之间释放锁，不会长时间阻塞写入
+
+    Returns:
+        {"steps", "reclaimed_pages", "reclaimed_bytes", "remaining_pages"}
+    """
+    steps = 0
+    reclaimed = 0
+    with bind.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        if _pragma(conn, "auto_vacuum") != 2:
+            raise RuntimeError("数据库未启用增量回收，请先执行 --enable-incremental")
+        page_size = _pragma(conn, "page_size")
+        remaining = _pragma(conn, "freelist_count")
+
+        while remaining > 0 and (max_steps is None or steps < max_steps):
+            # incremental_vacuum 每次 step 只回收一页，普通 execute 只 step 一次；
+            # executescript 会把语句执行到底
+            conn.connection.driver_connection.executescript(
+                f"PRAGMA incremental_vacuum({int(pages_per_step)})"
+            )
+            after = _pragma(conn, "freelist_count")
+            reclaimed += remaining - after
+            steps += 1
+            if after >= remaining:
+                break
+            remaining = after
+            if remaining > 0 and pause:
+                time.sleep(pause)
+
+    return {
+        "steps": steps,
+        "reclaimed_pages": reclaimed,
+        "reclaimed_bytes": reclaimed * page_size,
+        "remaining_pages": remaining,
+    }
+
+
+def _mb(size) -> str:
+    return f"{(size or 0) / 1024 / 1024:.2f} MB"
+
+
+def print_report(report: dict) -> None:
+    print(f"📦 数据库文件: {DATABASE_PATH} ({_mb(report['file_size'])})")
+    print(f"   页大小: {report['page_size']} B，总页数: {report['page_count']}")
+    print(f"   空闲页: {report['freelist_count']} ({_mb(report['free_bytes'])})")
+    print(f"   auto_vacuum: {report['auto_vacuum']}")
+    if report["tables"] is None:
+        print("   （当前 SQLite 未启用 dbstat，无法统计各表占用）")
+        return
+    print("   各表/索引占用:")
+    for item in report["tables"][:20]:
+        print(f"     {item['name']:<40} {_mb(item['bytes']):>12}  未使用 {_mb(item['unused_bytes'])}")
+
+
+if __name__ == "__main__":
+    if "--enable-incremental" in sys.argv:
+        print("正在切换为增量自动回收并执行 VACUUM（期间数据库不可写）...")
+        if enable_incremental_auto_vacuum():
+            print("✓ 已启用 auto_vacuum=INCREMENTAL")
+        else:
+            print("数据库已是增量回收模式，无需切换")
+
+    if "--vacuum" in sys.argv:
+        steps = get_option("steps")
+        result = incremental_vacuum(max_steps=int(steps) if steps else None)
+        print(f"✓ 执行 {result['steps']} 步，回收 {_mb(result['reclaimed_bytes'])}，"
+              f"剩余空闲页 {result['remaining_pages']}")
+
+    print_report(storage_report())
@@ -1,12 +1,15 @@
 """
 数据库CRUD操作
 """
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_, func
-from typing import List, Optional
+from sqlalchemy.orm import Session, undefer
+from sqlalchemy import or_, and_, func, insert
+from sqlalchemy.exc import IntegrityError
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime, timedelta
 import math
 import json
 from backend import models, schemas
+from backend.utils.image_storage import image_storage, content_hash
 
 
 def compute_s_factor(pressure: Optional[float], tc: Optional[float]) -> Optional[float]:
@@ -199,9 +202,10 @@ def create_paper(
     contributor_name: str = "匿名贡献者",
     contributor_affiliation: str = "未提供单位",
     notes: Optional[str] = None,
-    show_in_chart: bool = False
+    show_in_chart: bool = False,
+    commit: bool = True
 ) -> models.Paper:
-    """创建文献记录"""
+    """创建文献记录（commit=False 时只 flush 以获得ID，由调用方提交）"""
     paper = models.Paper(
         compound_id=compound_id,
         doi=doi,
@@ -224,17 +228,21 @@ def create_paper(
         show_in_chart=show_in_chart
     )
     db.add(paper)
-    db.commit()
-    db.refresh(paper)
+    if commit:
+        db.commit()
+        db.refresh(paper)
+    else:
+        db.flush()
     return paper
 
 
 def create_paper_data(
     db: Session,
     paper_id: int,
-    data_list: List[dict]
+    data_list: List[dict],
+    commit: bool = True
 ) -> List[models.PaperData]:
-    """为指定文献创建多组物理数据记录"""
+    """为指定文献创建多组物理数据记录（commit=False 时由调用方提交）"""
     db_data_list = []
     for item in data_list:
         pressure_val = item.get("pressure")
@@ -255,7 +263,8 @@ def create_paper_data(
         db.add(db_data)
         db_data_list.append(db_data)
 
-    db.commit()
+    if commit:
+        db.commit()
     return db_data_list
 
 
@@ -270,6 +279,126 @@ def check_paper_exists(db: Session, compound_id: int, doi: str) -> bool:
     return paper is not None
 
 
+def plan_bulk_papers(db: Session, papers: List[dict]) -> Tuple[List[dict], List[dict]]:
+    """
+    批量导入的预检查（只读）：一次性加载元素、元素组合和已有的 (compound_id, doi)
+
+    Args:
+        papers: 解析后的文献，需包含 row、doi、element_symbols（"-" 分隔）
+
+    Returns:
+        (待插入的文献, 被跳过的行结果)；待插入的文献附带 compound_key、compound_id（新组合为 None）
+    """
+    valid_elements = {symbol for (symbol,) in db.query(models.Element.symbol).all()}
+    compounds = dict(db.query(models.Compound.element_symbols, models.Compound.id).all())
+
+    candidates = []
+    skipped = []
+    for p_data in papers:
+        symbols = sorted(set(s for s in p_data["element_symbols"].split("-") if s in valid_elements))
+        if not symbols:
+            skipped.append({"row": p_data.get("row"), "doi": p_data["doi"], "status": "invalid",
+                            "detail": "化学式中没有有效的元素符号"})
+            continue
+        compound_key = "-".join(symbols)
+        candidates.append({**p_data, "compound_key": compound_key, "compound_id": compounds.get(compound_key)})
+
+    # 已存在的 (compound_id, doi)：只查本次涉及的组合和DOI
+    compound_ids = {c["compound_id"] for c in candidates if c["compound_id"] is not None}
+    dois = {c["doi"] for c in candidates}
+    existing = set()
+    if compound_ids:
+        existing = set(db.query(models.Paper.compound_id, models.Paper.doi).filter(
+            models.Paper.compound_id.in_(compound_ids), models.Paper.doi.in_(dois)
+        ).all())
+
+    planned = []
+    seen = set()
+    for candidate in candidates:
+        key = (candidate["compound_key"], candidate["doi"])
+        if (candidate["compound_id"], candidate["doi"]) in existing:
+            skipped.append({"row": candidate.get("row"), "doi": candidate["doi"], "status": "duplicate",
+                            "detail": "该元素组合下已存在此DOI"})
+        elif key in seen:
+            skipped.append({"row": candidate.get("row"), "doi": candidate["doi"], "status": "duplicate",
+                            "detail": "文件中重复的行"})
+        else:
+            seen.add(key)
+            planned.append(candidate)
+    return planned, skipped
+
+
+def bulk_create_papers(db: Session, papers: List[dict], data_points: Dict[int, List[dict]]) -> List[int]:
+    """
+    批量创建文献及物理数据（单个事务）
+
+    新元素组合、文献、物理数据各用一条 executemany 插入，文献ID通过 RETURNING 取回
+
+    Args:
+        papers: plan_bulk_papers 返回的文献，需包含 compound_key、compound_id、id_temp 及 papers 表的列
+        data_points: id_temp -> 物理数据列表
+
+    Returns:
+        与 papers 顺序对应的新文献ID
+    """
+    if not papers:
+        return []
+    paper_columns = {column.key for column in models.Paper.__table__.columns} - {
+        "id", "compound_id", "created_at", "updated_at"
+    }
+    try:
+        # 1. 新元素组合
+        new_keys = sorted({p["compound_key"] for p in papers if p["compound_id"] is None})
+        compound_ids = {}
+        if new_keys:
+            element_ids = dict(db.query(models.Element.symbol, models.Element.id).all())
+            rows = db.execute(
+                insert(models.Compound).returning(
+                    models.Compound.element_symbols, models.Compound.id, sort_by_parameter_order=True
+                ),
+                [{
+                    "element_symbols": key,
+                    "element_list": json.dumps(key.split("-")),
+                    "element_id_list": json.dumps(sorted(element_ids[s] for s in key.split("-")))
+                } for key in new_keys]
+            ).all()
+            compound_ids = dict(rows)
+
+        # 2. 文献
+        paper_ids = db.scalars(
+            insert(models.Paper).returning(models.Paper.id, sort_by_parameter_order=True),
+            [{
+                **{k: v for k, v in p.items() if k in paper_columns},
+                "compound_id": p["compound_id"] if p["compound_id"] is not None else compound_ids[p["compound_key"]]
+            } for p in papers]
+        ).all()
+
+        # 3. 物理数据
+        data_rows = []
+        for p, paper_id in zip(papers, paper_ids):
+            for item in data_points.get(p["id_temp"], []):
+                s_factor_val = item.get("s_factor")
+                if s_factor_val is None:
+                    s_factor_val = compute_s_factor(item.get("pressure"), item.get("tc"))
+                data_rows.append({
+                    "paper_id": paper_id,
+                    "pressure": item.get("pressure"),
+                    "tc": item.get("tc"),
+                    "lambda_val": item.get("lambda_val"),
+                    "omega_log": item.get("omega_log"),
+                    "n_ef": item.get("n_ef"),
+                    "s_factor": s_factor_val
+                })
+        if data_rows:
+            db.execute(insert(models.PaperData), data_rows)
+
+        db.commit()
+        return list(paper_ids)
+    except Exception:
+        db.rollback()
+        raise
+
+
 def get_papers_by_compound(
     db: Session,
     compound_id: int,
@@ -355,19 +484,45 @@ def create_paper_image(
     image_data: bytes,
     thumbnail_data: bytes,
     image_order: int,
-    file_size: int
+    file_size: int,
+    perceptual_hash: Optional[str] = None,
+    rendition_version: Optional[str] = None,
+    commit: bool = True
 ) -> models.PaperImage:
-    """创建文献截图"""
+    """
+    创建文献截图（二进制按当前存储后端保存）
+
+    内容与已有截图完全相同时不再另存一份 BLOB：新旧记录都改为引用内容仓库中的同一个文件
+    （旧记录仍内联保存的 BLOB 会被移入仓库）
+
+    Args:
+        commit: False 时只 flush，由调用方在同一事务中提交
+    """
     image = models.PaperImage(
         paper_id=paper_id,
-        image_data=image_data,
-        thumbnail_data=thumbnail_data,
         image_order=image_order,
-        file_size=file_size
+        file_size=file_size,
+        perceptual_hash=perceptual_hash,
+        rendition_version=rendition_version
     )
+    digest = content_hash(image_data)
+    shared = db.query(models.PaperImage.id).filter(models.PaperImage.image_hash == digest).first() is not None
+    if shared:
+        inline_duplicates = db.query(models.PaperImage).options(
+            undefer(models.PaperImage.image_data), undefer(models.PaperImage.thumbnail_data)
+        ).filter(
+            models.PaperImage.image_hash == digest,
+            func.length(models.PaperImage.image_data) > 0
+        ).all()
+        for duplicate in inline_duplicates:
+            image_storage.move_to_files(duplicate)
+    image_storage.store(image, image_data, thumbnail_data, shared=shared)
     db.add(image)
-    db.commit()
-    db.refresh(image)
+    if commit:
+        db.commit()
+        db.refresh(image)
+    else:
+        db.flush()
     return image
 
 
@@ -378,14 +533,64 @@ def get_paper_images(db: Session, paper_id: int) -> List[models.PaperImage]:
     ).order_by(models.PaperImage.image_order).all()
 
 
-def get_image_by_id(db: Session, image_id: int) -> Optional[models.PaperImage]:
-    """根据ID获取截图"""
-    return db.query(models.PaperImage).filter(models.PaperImage.id == image_id).first()
+def get_image_by_id(
+    db: Session,
+    image_id: int,
+    thumbnail: Optional[bool] = None
+) -> Optional[models.PaperImage]:
+    """
+    根据ID获取截图
+
+    Args:
+        thumbnail: True 只加载缩略图二进制，False 只加载原图二进制，None 不加载二进制
+    """
+    query = db.query(models.PaperImage).filter(models.PaperImage.id == image_id)
+    if thumbnail is not None:
+        query = query.options(undefer(_image_blob_column(thumbnail)))
+    return query.first()
 
 
-def get_image_by_order(db: Session, paper_id: int, image_order: int) -> Optional[models.PaperImage]:
-    """根据文献ID和图片顺序获取截图"""
-    return db.query(models.PaperImage).filter(
+def get_image_by_order(
+    db: Session,
+    paper_id: int,
+    image_order: int,
+    thumbnail: Optional[bool] = None
+) -> Optional[models.PaperImage]:
+    """
+    根据文献ID和图片顺序获取截图
+
+    Args:
+        thumbnail: True 只加载缩略图二进制，False 只加载原图二进制，None 不加载二进制
+    """
+    query = db.query(models.PaperImage).filter(
+        and_(
+            models.PaperImage.paper_id == paper_id,
+            models.PaperImage.image_order == image_order
+        )
+    )
+    if thumbnail is not None:
+        query = query.options(undefer(_image_blob_column(thumbnail)))
+    return query.first()
+
+
+def get_image_meta_by_id(db: Session, image_id: int):
+    """根据ID获取截图的哈希与时间（不读取图片二进制）"""
+    return db.query(
+        models.PaperImage.id,
+        models.PaperImage.image_hash,
+        models.PaperImage.thumbnail_hash,
+        models.PaperImage.created_at
+    ).filter(models.PaperImage.id == image_id).first()
+
+
+def get_image_meta_by_order(db: Session, paper_id: int, image_order: int):
+    """根据文献ID和图片顺序获取截图的哈希与时间（不读取图片二进制）"""
+    return db.query(
+        models.PaperImage.id,
+        models.PaperImage.image_hash,
+        models.PaperImage.thumbnail_hash,
+        models.PaperImage.created_at
+    ).filter(
         and_(
             models.PaperImage.paper_id == paper_id,
             models.PaperImage.image_order == image_order
@@ -393,9 +598,83 @@ def get_image_by_order(db: Session, paper_id: int, image_order: int) -> Optional
     ).first()
 
 
+def _image_blob_column(thumbnail: bool):
+    return models.PaperImage.thumbnail_data if thumbnail else models.PaperImage.image_data
+
+
+def get_image_blob_size(db: Session, image_id: int, thumbnail: bool = False) -> Optional[int]:
+    """获取数据库中截图二进制的长度（不读取内容）"""
+    return db.query(func.length(_image_blob_column(thumbnail))).filter(
+        models.PaperImage.id == image_id
+    ).scalar()
+
+
+def read_image_blob(
+    db: Session,
+    image_id: int,
+    thumbnail: bool = False,
+    start: int = 0,
+    length: Optional[int] = None
+) -> Optional[bytes]:
+    """读取数据库中截图二进制的指定字节窗口（length 为 None 时读取全部）"""
+    column = _image_blob_column(thumbnail)
+    expr = column if length is None else func.substr(column, start + 1, length)
+    return db.query(expr).filter(models.PaperImage.id == image_id).scalar()
+
+
+def backfill_image_hash(db: Session, image_id: int, thumbnail: bool = False) -> Optional[str]:
+    """为缺少内容哈希的旧截图补算并保存哈希"""
+    data = read_image_blob(db, image_id, thumbnail)
+    if not data:
+        return None
+    digest = content_hash(data)
+    column = "thumbnail_hash" if thumbnail else "image_hash"
+    db.query(models.PaperImage).filter(models.PaperImage.id == image_id).update(
+        {column: digest}, synchronize_session=False
+    )
+    db.commit()
+    return digest
+
+
 def get_paper_image_count(db: Session, paper_id: int) -> int:
     """获取文献的截图数量"""
-    return db.query(models.PaperImage).filter(models.PaperImage.paper_id == paper_id).count()
+    return db.query(func.count(models.PaperImage.id)).filter(
+        models.PaperImage.paper_id == paper_id
+    ).scalar()
+
+
+def get_paper_image_counts(db: Session, paper_ids: List[int]) -> dict:
+    """一次查询获取多篇文献的截图数量 {paper_id: count}"""
+    if not paper_ids:
+        return {}
+    rows = db.query(models.PaperImage.paper_id, func.count(models.PaperImage.id)).filter(
+        models.PaperImage.paper_id.in_(paper_ids)
+    ).group_by(models.PaperImage.paper_id).all()
+    return dict(rows)
+
+
+def get_first_image_metas(db: Session, paper_ids: List[int]):
+    """一次查询获取多篇文献第一张截图的ID与缩略图哈希（不读取图片二进制）"""
+    if not paper_ids:
+        return []
+    return db.query(
+        models.PaperImage.paper_id,
+        models.PaperImage.id,
+        models.PaperImage.thumbnail_hash
+    ).filter(
+        models.PaperImage.paper_id.in_(paper_ids),
+        models.PaperImage.image_order == 1
+    ).order_by(models.PaperImage.paper_id).all()
+
+
+def read_thumbnail_blobs(db: Session, image_ids: List[int]) -> dict:
+    """一次查询读取多张截图的缩略图二进制 {image_id: bytes}"""
+    if not image_ids:
+        return {}
+    rows = db.query(models.PaperImage.id, models.PaperImage.thumbnail_data).filter(
+        models.PaperImage.id.in_(image_ids)
+    ).all()
+    return {image_id: data for image_id, data in rows if data}
 
 
 # ============= 统计相关操作 =============
@@ -415,6 +694,20 @@ def get_compound_papers_count(db: Session, compound_id: int) -> int:
     return db.query(models.Paper).filter(models.Paper.compound_id == compound_id).count()
 
 
+def get_data_version(db: Session) -> tuple:
+    """
+    获取文献/物理数据的数据版本标识
+    任一记录新增、修改或删除后都会变化，用于统计结果缓存失效
+    """
+    return (
+        db.query(func.max(models.Paper.updated_at)).scalar(),
+        db.query(func.max(models.PaperData.updated_at)).scalar(),
+        db.query(func.max(models.DeletedRecord.id)).scalar(),
+        db.query(func.count(models.Paper.id)).scalar(),
+        db.query(func.count(models.PaperData.id)).scalar(),
+    )
+
+
 # ============= 辅助功能 =============
 
 def get_all_crystal_structures(db: Session) -> List[str]:
@@ -427,3 +720,144 @@ def get_all_crystal_structures(db: Session) -> List[str]:
     # 提取字符串并排序
     structures = [r[0] for r in results if r[0]]
     return sorted(structures)
+
+
+# ============= 增量同步 =============
+
+# 读取变更时向前回看的时间窗口：覆盖"已写入时间戳但尚未提交"的事务，
+# 重复下发的记录由客户端按ID幂等覆盖
+SYNC_OVERLAP = timedelta(seconds=5)
+
+
+def record_paper_deletion(db: Session, paper: models.Paper) -> None:
+    """为即将删除的文献及其物理数据写入墓碑（需与删除操作在同一事务中提交）"""
+    data_ids = [row[0] for row in db.query(models.PaperData.id).filter(
+        models.PaperData.paper_id == paper.id
+    ).all()]
+    record_paper_data_deletion(db, paper.id, data_ids)
+    db.add(models.DeletedRecord(table_name="papers", record_id=paper.id, paper_id=paper.id))
+
+
+def record_paper_data_deletion(db: Session, paper_id: int, data_ids: List[int]) -> None:
+    """为即将删除的物理数据写入墓碑（需与删除操作在同一事务中提交）"""
+    for data_id in data_ids:
+        db.add(models.DeletedRecord(table_name="paper_data", record_id=data_id, paper_id=paper_id))
+
+
+def get_sync_changes(db: Session, since: Optional[datetime] = None) -> dict:
+    """
+    获取指定时间点之后新增、修改或删除的文献与物理数据
+
+    Args:
+        since: 上次同步返回的时间点；为 None 时返回全量快照
+
+    Returns:
+        {"papers": [...], "paper_data": [...], "deleted_papers": [...], "deleted_paper_data": [...]}
+        仅管理员可见（admin_only）的文献按删除处理
+    """
+    window_start = since - SYNC_OVERLAP if since else None
+
+    paper_query = db.query(models.Paper, models.Compound.element_symbols).join(
+        models.Compound, models.Compound.id == models.Paper.compound_id
+    )
+    if window_start:
+        paper_query = paper_query.filter(models.Paper.updated_at > window_start)
+
+    papers = []
+    deleted_papers = []
+    for paper, element_symbols in paper_query.order_by(models.Paper.id).all():
+        if paper.review_status == "admin_only":
+            if window_start:
+                deleted_papers.append(paper.id)
+            continue
+        papers.append({
+            "id": paper.id,
+            "element_symbols": element_symbols,
+            "doi": paper.doi,
+            "title": paper.title,
+            "journal": paper.journal,
+            "year": paper.year,
+            "article_type": paper.article_type,
+            "superconductor_type": paper.superconductor_type,
+            "chemical_formula": paper.chemical_formula,
+            "crystal_structure": paper.crystal_structure,
+            "review_status": paper.review_status,
+            "show_in_chart": paper.show_in_chart,
+            "updated_at": paper.updated_at.isoformat() if paper.updated_at else None
+        })
+
+    data_query = db.query(models.PaperData).join(
+        models.Paper, models.Paper.id == models.PaperData.paper_id
+    ).filter(models.Paper.review_status != "admin_only")
+    if window_start:
+        data_query = data_query.filter(models.PaperData.updated_at > window_start)
+
+    paper_data = [
+        {
+            "id": d.id,
+            "paper_id": d.paper_id,
+            "pressure": d.pressure,
+            "tc": d.tc,
+            "lambda_val": d.lambda_val,
+            "omega_log": d.omega_log,
+            "n_ef": d.n_ef,
+            "s_factor": d.s_factor
+        }
+        for d in data_query.order_by(models.PaperData.id).all()
+    ]
+
+    deleted_paper_data = []
+    if window_start:
+        tombstones = db.query(models.DeletedRecord).filter(
+            models.DeletedRecord.deleted_at > window_start
+        ).order_by(models.DeletedRecord.id).all()
+        for record in tombstones:
+            if record.table_name == "papers":
+                deleted_papers.append(record.record_id)
+            elif record.table_name == "paper_data":
+                deleted_paper_data.append(record.record_id)
+
+    return {
+        "papers": papers,
+        "paper_data": paper_data,
+        "deleted_papers": sorted(set(deleted_papers)),
+        "deleted_paper_data": sorted(set(deleted_paper_data))
+    }
+
+
+# ============= DOI 元数据缓存 =============
+
+def get_cached_doi(db: Session, doi: str) -> Optional[models.DoiMetadata]:
+    """按规范化DOI读取缓存记录（包括已过期的，由调用方判断）"""
+    return db.query(models.DoiMetadata).filter(models.DoiMetadata.doi == doi).first()
+
+
+def save_doi_metadata(
+    db: Session,
+    doi: str,
+    metadata: Optional[dict],
+    raw: Optional[dict],
+    ttl: timedelta
+) -> models.DoiMetadata:
+    """
+    写入或更新DOI缓存
+
+    Args:
+        metadata: 提取后的元数据；为None时表示DOI不存在（负缓存）
+        raw: CrossRef 原始 message
+        ttl: 有效期
+    """
+    now = datetime.utcnow()
+    entry = get_cached_doi(db, doi) or models.DoiMetadata(doi=doi)
+    entry.found = metadata is not None
+    entry.metadata_json = json.dumps(metadata, ensure_ascii=False) if metadata is not None else None
+    entry.raw_response = json.dumps(raw, ensure_ascii=False) if raw is not None else None
+    entry.fetched_at = now
+    entry.expires_at = now + ttl
+    db.add(entry)
+    try:
+        db.commit()
+    except IntegrityError:
+        # 并发请求已写入同一DOI，以先写入的为准
+        db.rollback()
+    return entry
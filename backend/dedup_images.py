@@ -0,0 +1,232 @@
+"""
+截图去重工具：报告并合并重复的文献截图
+
+- 完全相同（内容哈希相同）：多条记录各自保存了一份 BLOB，合并后共用内容仓库中的一个文件
+- 感知重复（dHash 相同或汉明距离很小）：同一张图被重新压缩/缩放后再次上传；
+  科研图表版式相近时也可能误判，因此只报告，需显式指定 --merge-perceptual 才合并
+
+使用方法：
+python -m backend.dedup_images                        # 补算感知哈希并报告重复情况
+python -m backend.dedup_images --distance=3           # 汉明距离 <= 3 视为感知重复（最大 3）
+python -m backend.dedup_images --merge                # 合并完全相同的截图
+python -m backend.dedup_images --merge-perceptual     # 同时合并感知重复的截图（保留最大的一张）
+python -m backend.dedup_images --workers=8            # 指定补算哈希的并行进程数
+
+合并后运行 python -m backend.migrate_images --gc 清理不再被引用的文件；
+数据库中释放的 BLOB 空间需执行 VACUUM 才会归还给文件系统。
+"""
+import os
+import sys
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+from sqlalchemy.orm import undefer
+
+from backend.database import SessionLocal
+from backend import crud, models
+from backend.utils.cli import get_option
+from backend.utils.image_processor import perceptual_hash, hamming_distance
+from backend.utils.image_storage import image_storage
+
+BATCH_SIZE = 100
+# 64 位哈希分成 4 段，汉明距离 <= 3 的两个哈希至少有一段完全相同（鸽巢原理）
+HASH_BANDS = 4
+MAX_DISTANCE = HASH_BANDS - 1
+
+
+def _safe_perceptual_hash(image_data: bytes):
+    try:
+        return perceptual_hash(image_data)
+    except ValueError:
+        return None
+
+
+def backfill_perceptual_hashes(workers: int = None) -> int:
+    """为缺少感知哈希的截图并行补算哈希，每批提交一次（可中断后继续）"""
+    db = SessionLocal()
+    try:
+        pending = db.query(models.PaperImage.id, models.PaperImage.image_hash).filter(
+            models.PaperImage.perceptual_hash.is_(None)
+        ).order_by(models.PaperImage.id).all()
+        print(f"开始为 {len(pending)} 张截图补算感知哈希...")
+
+        updated = 0
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for start in range(0, len(pending), BATCH_SIZE):
+                batch = pending[start:start + BATCH_SIZE]
+                loaded = []
+                for image_id, image_hash in batch:
+                    path = image_storage.files.locate(image_hash)
+                    data = path.read_bytes() if path else crud.read_image_blob(db, image_id)
+                    if data:
+                        loaded.append((image_id, data))
+
+                hashes = pool.map(_safe_perceptual_hash, [data for _, data in loaded])
+                for (image_id, _), phash in zip(loaded, hashes):
+                    if phash:
+                        db.query(models.PaperImage).filter(models.PaperImage.id == image_id).update(
+                            {"perceptual_hash": phash}, synchronize_session=False
+                        )
+                        updated += 1
+                db.commit()
+                print(f"已处理 {min(start + BATCH_SIZE, len(pending))}/{len(pending)} 张...")
+
+        print(f"✓ 感知哈希补算完成：{updated} 张")
+        return updated
+    finally:
+        db.close()
+
+
+def _load_rows(db):
+    return db.query(
+        models.PaperImage.id,
+        models.PaperImage.paper_id,
+        models.PaperImage.image_hash,
+        models.PaperImage.perceptual_hash,
+        models.PaperImage.file_size
+    ).order_by(models.PaperImage.id).all()
+
+
+def find_exact_duplicates(rows) -> List[list]:
+    """按内容哈希分组，返回包含多条记录的组"""
+    groups = defaultdict(list)
+    for row in rows:
+        if row.image_hash:
+            groups[row.image_hash].append(row)
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def find_perceptual_duplicates(rows, distance: int = 0) -> List[list]:
+    """
+    按感知哈希分组（汉明距离 <= distance），只返回内容哈希不同的组
+
+    用分段索引找候选，避免两两比较
+    """
+    distance = min(distance, MAX_DISTANCE)
+    # 每个内容哈希只取一个代表
+    representatives: Dict[str, object] = {}
+    for row in rows:
+        if row.perceptual_hash and row.image_hash:
+            representatives.setdefault(row.image_hash, row)
+    reps = list(representatives.values())
+
+    parent = list(range(len(reps)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    band_width = 16 // HASH_BANDS
+    buckets = defaultdict(list)
+    for index, row in enumerate(reps):
+        for band in range(HASH_BANDS):
+            key = (band, row.perceptual_hash[band * band_width:(band + 1) * band_width])
+            buckets[key].append(index)
+
+    for members in buckets.values():
+        for i in range(len(members)):
+            for j in range(i + 1, len(members)):
+                a, b = members[i], members[j]
+                if find(a) != find(b) and hamming_distance(
+                    reps[a].perceptual_hash, reps[b].perceptual_hash
+                ) <= distance:
+                    parent[find(a)] = find(b)
+
+    clusters = defaultdict(list)
+    for index, row in enumerate(reps):
+        clusters[find(index)].append(row)
+    return [group for group in clusters.values() if len(group) > 1]
+
+
+def _move_to_store(db, image_ids: List[int]) -> int:
+    """把记录中的 BLOB 写入内容仓库并清空，返回移出的字节数"""
+    images = db.query(models.PaperImage).options(
+        undefer(models.PaperImage.image_data), undefer(models.PaperImage.thumbnail_data)
+    ).filter(models.PaperImage.id.in_(image_ids)).all()
+    return sum(image_storage.move_to_files(image) for image in images)
+
+
+def merge_exact_duplicates(db, groups) -> int:
+    """完全相同的截图：内容只在仓库中保存一份，清空各记录的 BLOB"""
+    reclaimed = 0
+    for start in range(0, len(groups), BATCH_SIZE):
+        for group in groups[start:start + BATCH_SIZE]:
+            moved = _move_to_store(db, [row.id for row in group])
+            # 写入仓库的只有一份，其余都是回收的空间
+            reclaimed += moved - moved // len(group)
+        db.commit()
+        db.expunge_all()
+    return reclaimed
+
+
+def merge_perceptual_duplicates(db, groups) -> int:
+    """感知重复的截图：保留最大的一张，其余记录改为引用它的内容"""
+    merged = 0
+    for group in groups:
+        canonical = max(group, key=lambda row: row.file_size or 0)
+        image = db.query(models.PaperImage).filter(models.PaperImage.id == canonical.id).one()
+        # 确保保留的内容在仓库中
+        _move_to_store(db, [canonical.id])
+        others = [row.image_hash for row in group if row.image_hash != canonical.image_hash]
+        duplicates = db.query(models.PaperImage).filter(models.PaperImage.image_hash.in_(others)).all()
+        _move_to_store(db, [dup.id for dup in duplicates])
+        for dup in duplicates:
+            dup.image_hash = image.image_hash
+            dup.thumbnail_hash = image.thumbnail_hash
+            dup.perceptual_hash = image.perceptual_hash
+            dup.file_size = image.file_size
+            merged += 1
+        db.commit()
+        db.expunge_all()
+    return merged
+
+
+def dedup_images(distance: int = 0, merge: bool = False, merge_perceptual: bool = False,
+                 workers: int = None) -> None:
+    """补算哈希、报告并按需合并重复截图"""
+    backfill_perceptual_hashes(workers)
+
+    db = SessionLocal()
+    try:
+        rows = _load_rows(db)
+        exact_groups = find_exact_duplicates(rows)
+        perceptual_groups = find_perceptual_duplicates(rows, distance)
+
+        exact_copies = sum(len(group) - 1 for group in exact_groups)
+        print(f"\n📊 共 {len(rows)} 张截图")
+        print(f"   完全相同: {len(exact_groups)} 组，多余副本 {exact_copies} 份")
+        print(f"   感知重复 (距离 <= {min(distance, MAX_DISTANCE)}): {len(perceptual_groups)} 组")
+        for group in perceptual_groups[:20]:
+            described = ", ".join(f"paper {row.paper_id}/image {row.id}" for row in group)
+            print(f"     - {described}")
+        if len(perceptual_groups) > 20:
+            print(f"     ... 另有 {len(perceptual_groups) - 20} 组")
+
+        if not (merge or merge_perceptual):
+            return
+
+        reclaimed = merge_exact_duplicates(db, exact_groups)
+        print(f"✓ 已合并完全相同的截图，共节省约 {reclaimed / 1024 / 1024:.2f} MB")
+
+        if merge_perceptual:
+            merged = merge_perceptual_duplicates(db, perceptual_groups)
+            print(f"✓ 已合并 {merged} 张感知重复的截图")
+        print("提示: 运行 python -m backend.migrate_images --gc 清理不再被引用的文件")
+    except Exception as e:
+        print(f"去重失败: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    dedup_images(
+        distance=get_option("distance", 0),
+        merge="--merge" in sys.argv,
+        merge_perceptual="--merge-perceptual" in sys.argv,
+        workers=get_option("workers", os.cpu_count() or 1)
+    )
@@ -0,0 +1,184 @@
+"""
+补全占位元数据的文献
+
+批量上传和管理员手动录入（CrossRef 不可用时）会用占位信息保存文献：
+标题 "Imported: ..." / "Manual Entry: ..."、作者 "Batch Import" / "Administrator"、年份为录入当年、没有摘要。
+本工具按 ID 顺序分块找出这些文献，并发、限速地解析 DOI（复用 DOIResolver 的缓存、离线索引、重试与熔断），
+用真实元数据更新记录并重新生成 APS / BibTeX 引用，每块一个事务。补全过的文献记录 metadata_enriched_at，
+即使 CrossRef 没有返回作者也不会被再次选中；仍无法解析的文献保持原样，下次运行再试。
+
+使用方法：
+python -m backend.enrich_metadata                    # 补全全部占位文献
+python -m backend.enrich_metadata --chunk=100        # 每块处理的文献数
+python -m backend.enrich_metadata --concurrency=3    # 同时进行的 CrossRef 请求数
+python -m backend.enrich_metadata --dry-run          # 只统计占位文献数量
+
+也可以设置 ENRICH_METADATA_ON_STARTUP=1，服务启动后在后台执行（ENRICH_METADATA_INTERVAL_MINUTES > 0 时定期执行）。
+"""
+import asyncio
+import json
+import os
+import sys
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, or_
+
+from backend.database import SessionLocal
+from backend import models
+from backend.utils.cli import get_option
+from backend.utils.citation import generate_aps_citation, generate_bibtex_citation
+from backend.utils.doi_resolver import CROSSREF_BATCH_CONCURRENCY, doi_resolver, normalize_doi
+from backend.utils.event_broadcaster import publish_event
+
+CHUNK_SIZE = 50
+ENRICH_METADATA_INTERVAL_MINUTES = float(os.environ.get("ENRICH_METADATA_INTERVAL_MINUTES", 0))
+
+PLACEHOLDER_TITLE_PREFIXES = ("Imported:", "Manual Entry:")
+PLACEHOLDER_AUTHORS = ('["Batch Import"]', '["Administrator"]')
+
+
+def _placeholder_filter():
+    return and_(
+        models.Paper.metadata_enriched_at.is_(None),
+        or_(
+            *[models.Paper.title.like(f"{prefix}%") for prefix in PLACEHOLDER_TITLE_PREFIXES],
+            models.Paper.authors.in_(PLACEHOLDER_AUTHORS)
+        )
+    )
+
+
+def count_placeholders(db=None) -> int:
+    """统计占位元数据的文献数"""
+    own_session = db is None
+    db = db or SessionLocal()
+    try:
+        return db.query(models.Paper.id).filter(_placeholder_filter()).count()
+    finally:
+        if own_session:
+            db.close()
+
+
+def _next_chunk(after_id: int, limit: int) -> List[Tuple[int, str]]:
+    db = SessionLocal()
+    try:
+        return db.query(models.Paper.id, models.Paper.doi).filter(
+            _placeholder_filter(), models.Paper.id > after_id
+        ).order_by(models.Paper.id).limit(limit).all()
+    finally:
+        db.close()
+
+
+def _apply_metadata(updates: Dict[int, dict]) -> List[int]:
+    """在一个事务中把元数据写入文献并重新生成引用，返回更新的文献ID"""
+    db = SessionLocal()
+    try:
+        papers = db.query(models.Paper).filter(
+            models.Paper.id.in_(list(updates)), _placeholder_filter()
+        ).all()
+        for paper in papers:
+            metadata = updates[paper.id]
+            authors_list = metadata.get("authors") or []
+            paper.title = metadata.get("title") or paper.title
+            if authors_list:
+                paper.authors = json.dumps(authors_list, ensure_ascii=False)
+            paper.journal = metadata.get("journal") or paper.journal
+            paper.volume = metadata.get("volume") or paper.volume
+            paper.pages = metadata.get("pages") or paper.pages
+            paper.year = metadata.get("year") or paper.year
+            paper.abstract = metadata.get("abstract") or paper.abstract
+            # 没有作者时保留原引用，不用空作者列表生成
+            if authors_list:
+                paper.citation_aps = generate_aps_citation(
+                    authors_list, paper.title, paper.journal, paper.volume, paper.pages, paper.year, paper.doi
+                )
+                paper.citation_bibtex = generate_bibtex_citation(
+                    authors_list, paper.title, paper.journal, paper.volume, paper.pages, paper.year, paper.doi
+                )
+            paper.metadata_enriched_at = datetime.utcnow()
+        db.commit()
+        return [paper.id for paper in papers]
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+async def enrich_placeholder_papers(
+    chunk_size: int = CHUNK_SIZE,
+    concurrency: int = CROSSREF_BATCH_CONCURRENCY
+) -> int:
+    """
+    补全占位元数据的文献
+
+    数据库读写在线程池中执行，不阻塞事件循环；DOI 解析受 DOIResolver 的令牌桶限速
+
+    Returns:
+        成功补全的文献数
+    """
+    loop = asyncio.get_running_loop()
+    total = await loop.run_in_executor(None, count_placeholders)
+    print(f"开始补全 {total} 篇占位文献的元数据...")
+    if not total:
+        return 0
+
+    enriched = 0
+    processed = 0
+    after_id = 0
+    while True:
+        chunk = await loop.run_in_executor(None, _next_chunk, after_id, chunk_size)
+        if not chunk:
+            break
+        after_id = chunk[-1][0]
+        processed += len(chunk)
+
+        lookups = await doi_resolver.lookup_many([doi for _, doi in chunk], concurrency)
+        updates = {}
+        for paper_id, doi in chunk:
+            lookup = lookups.get(normalize_doi(doi))
+            if lookup is not None and lookup.metadata:
+                updates[paper_id] = lookup.metadata
+
+        if updates:
+            updated_ids = await loop.run_in_executor(None, _apply_metadata, updates)
+            enriched += len(updated_ids)
+            if updated_ids:
+                publish_event("dataset.changed", {"reason": "update", "paper_ids": updated_ids, "chart": False})
+
+        print(f"已处理 {processed}/{total} 篇，补全 {enriched} 篇")
+
+    print(f"✓ 元数据补全完成：补全 {enriched} 篇，{total - enriched} 篇暂时无法解析")
+    return enriched
+
+
+async def run_enrichment_worker(interval_minutes: Optional[float] = None) -> None:
+    """后台任务：执行一次补全；interval_minutes > 0 时按间隔重复执行"""
+    interval = ENRICH_METADATA_INTERVAL_MINUTES if interval_minutes is None else interval_minutes
+    while True:
+        try:
+            await enrich_placeholder_papers()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"⚠️ 元数据补全失败: {e}")
+        if interval <= 0:
+            return
+        await asyncio.sleep(interval * 60)
+
+
+async def _main():
+    try:
+        await enrich_placeholder_papers(
+            chunk_size=get_option("chunk", CHUNK_SIZE),
+            concurrency=get_option("concurrency", CROSSREF_BATCH_CONCURRENCY)
+        )
+    finally:
+        await doi_resolver.close()
+
+
+if __name__ == "__main__":
+    if "--dry-run" in sys.argv:
+        print(f"占位元数据的文献: {count_placeholders()} 篇")
+    else:
+        asyncio.run(_main())
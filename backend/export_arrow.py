@@ -0,0 +1,233 @@
+"""
+物理参数数据集导出工具（Arrow / Parquet）
+将 papers + paper_data 联表后的数据按记录批次写出，供分析脚本直接读取
+
+使用方法：
+python -m backend.export_arrow data/dataset.parquet
+python -m backend.export_arrow data/dataset.arrow --chart-only
+"""
+import sys
+from pathlib import Path
+from typing import Iterator, List
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from backend.database import SessionLocal
+from backend import models
+from backend.utils.superconductor_types import normalize_superconductor_type
+
+# 每个记录批次的行数：批次越大压缩越好，但单批内存占用越高
+BATCH_SIZE = 5000
+
+# 字典编码的字符串列（取值重复度高）
+DICT_STRING = pa.dictionary(pa.int32(), pa.string())
+
+DATASET_SCHEMA = pa.schema([
+    pa.field("paper_id", pa.int64(), nullable=False),
+    pa.field("data_id", pa.int64(), nullable=False),
+    pa.field("doi", pa.string(), nullable=False),
+    pa.field("title", pa.string()),
+    pa.field("element_symbols", DICT_STRING),
+    pa.field("chemical_formula", DICT_STRING),
+    pa.field("crystal_structure", DICT_STRING),
+    pa.field("article_type", DICT_STRING),
+    pa.field("superconductor_type", DICT_STRING),
+    pa.field("journal", DICT_STRING),
+    pa.field("year", pa.int32()),
+    pa.field("review_status", DICT_STRING),
+    pa.field("show_in_chart", pa.bool_()),
+    pa.field("pressure", pa.float64()),
+    pa.field("tc", pa.float64()),
+    pa.field("lambda_val", pa.float64()),
+    pa.field("omega_log", pa.float64()),
+    pa.field("n_ef", pa.float64()),
+    pa.field("s_factor", pa.float64()),
+])
+
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+
+def _dataset_query(chart_only: bool, include_admin_only: bool):
+    """构建 papers + paper_data + compounds 联表查询（按数据点ID有序）"""
+    stmt = (
+        select(
+            models.Paper.id,
+            models.PaperData.id,
+            models.Paper.doi,
+            models.Paper.title,
+            models.Compound.element_symbols,
+            models.Paper.chemical_formula,
+            models.Paper.crystal_structure,
+            models.Paper.article_type,
+            models.Paper.superconductor_type,
+            models.Paper.journal,
+            models.Paper.year,
+            models.Paper.review_status,
+            models.Paper.show_in_chart,
+            models.PaperData.pressure,
+            models.PaperData.tc,
+            models.PaperData.lambda_val,
+            models.PaperData.omega_log,
+            models.PaperData.n_ef,
+            models.PaperData.s_factor,
+        )
+        .join(models.PaperData, models.PaperData.paper_id == models.Paper.id)
+        .join(models.Compound, models.Compound.id == models.Paper.compound_id)
+        .order_by(models.PaperData.id)
+    )
+    if chart_only:
+        stmt = stmt.where(models.Paper.show_in_chart == True)
+    if not include_admin_only:
+        stmt = stmt.where(models.Paper.review_status != "admin_only")
+    return stmt
+
+
+def _rows_to_batch(rows: List[tuple]) -> pa.RecordBatch:
+    """将一批查询结果转换为带类型的 RecordBatch"""
+    columns = list(zip(*rows))
+    # superconductor_type 统一为七大类
+    sc_index = DATASET_SCHEMA.get_field_index("superconductor_type")
+    columns[sc_index] = [normalize_superconductor_type(v) for v in columns[sc_index]]
+
+    arrays = []
+    for field, values in zip(DATASET_SCHEMA, columns):
+        if pa.types.is_dictionary(field.type):
+            arrays.append(pa.array(values, type=pa.string()).dictionary_encode())
+        else:
+            arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=DATASET_SCHEMA)
+
+
+def iter_dataset_batches(
+    db: Session,
+    chart_only: bool = False,
+    include_admin_only: bool = False,
+    batch_size: int = BATCH_SIZE
+) -> Iterator[pa.RecordBatch]:
+    """
+    按批次逐块读取数据集，内存占用只与 batch_size 有关
+
+    Args:
+        db: 数据库会话
+        chart_only: 仅导出 show_in_chart 的文献
+        include_admin_only: 是否包含仅管理员可见的文献
+        batch_size: 每批行数
+    """
+    result = db.execute(
+        _dataset_query(chart_only, include_admin_only),
+        execution_options={"yield_per": batch_size}
+    )
+    for rows in result.partitions(batch_size):
+        if rows:
+            yield _rows_to_batch([tuple(r) for r in rows])
+
+
+class _ChunkSink:
+    """
+    只追加写入的内存缓冲，写出的字节可被分段取走
+    tell() 返回累计写入量，Parquet 写入器依赖它计算列块偏移
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self) -> bool:
+        return True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_arrow_ipc(batches: Iterator[pa.RecordBatch]) -> Iterator[bytes]:
+    """以 Arrow IPC stream 格式逐批输出字节"""
+    sink = _ChunkSink()
+    with pa.ipc.new_stream(pa.PythonFile(sink, mode="w"), DATASET_SCHEMA) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            yield sink.drain()
+    yield sink.drain()
+
+
+def stream_parquet(batches: Iterator[pa.RecordBatch]) -> Iterator[bytes]:
+    """以 Parquet 格式逐批输出字节（每个批次一个 row group）"""
+    sink = _ChunkSink()
+    with pq.ParquetWriter(pa.PythonFile(sink, mode="w"), DATASET_SCHEMA, compression="zstd") as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            yield sink.drain()
+    yield sink.drain()
+
+
+def export_dataset(output_file: str, chart_only: bool = False, include_admin_only: bool = True):
+    """
+    导出数据集到文件，按扩展名选择格式（.parquet 或 .arrow/.arrows）
+
+    Args:
+        output_file: 输出文件路径
+        chart_only: 仅导出 show_in_chart 的文献
+        include_admin_only: 是否包含仅管理员可见的文献
+    """
+    output_path = Path(output_file)
+    suffix = output_path.suffix.lower()
+    if suffix == ".parquet":
+        writer = stream_parquet
+    elif suffix in (".arrow", ".arrows"):
+        writer = stream_arrow_ipc
+    else:
+        raise ValueError("不支持的导出格式，请使用 .parquet 或 .arrow 扩展名")
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    db = SessionLocal()
+    rows = 0
+
+    def counted(batches):
+        nonlocal rows
+        for batch in batches:
+            rows += batch.num_rows
+            yield batch
+
+    try:
+        print(f"开始导出数据集到 {output_path} ...")
+        batches = counted(iter_dataset_batches(db, chart_only, include_admin_only))
+        with open(output_path, "wb") as f:
+            for chunk in writer(batches):
+                f.write(chunk)
+
+        print(f"\n✅ 导出完成！")
+        print(f"   文件位置: {output_path.absolute()}")
+        print(f"   数据点: {rows} 条")
+        print(f"   文件大小: {output_path.stat().st_size / 1024 / 1024:.2f} MB")
+    except Exception as e:
+        print(f"❌ 导出失败: {e}")
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    output_path = args[0] if args else "data/dataset.parquet"
+    export_dataset(output_path, chart_only="--chart-only" in sys.argv)
@@ -6,10 +6,11 @@ import json
 import base64
 import sys
 from pathlib import Path
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, undefer
 
 from backend.database import SessionLocal
 from backend import models
+from backend.utils.image_storage import image_storage
 
 
 def export_all_data(output_file: str = "data_export.json"):
@@ -104,15 +105,15 @@ def export_all_data(output_file: str = "data_export.json"):
         images_dir = Path("data/images")
         images_dir.mkdir(parents=True, exist_ok=True)
         
-        images = db.query(models.PaperImage).all()
+        images = db.query(models.PaperImage).options(undefer(models.PaperImage.image_data)).all()
         for img in images:
             # 生成文件名: paper_{paper_id}_order_{order}.jpg
             image_filename = f"paper_{img.paper_id}_order_{img.image_order}.jpg"
             image_path = images_dir / image_filename
             
-            # 写入原图文件
+            # 写入原图文件（兼容数据库与文件两种存储后端）
             with open(image_path, 'wb') as f:
-                f.write(img.image_data)
+                f.write(image_storage.read(img))
             
             data["paper_images"].append({
                 "id": img.id,
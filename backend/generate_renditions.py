@@ -0,0 +1,100 @@
+"""
+批量生成截图的 WebP/AVIF 副本
+
+图片接口在首次被支持新格式的浏览器请求时会在后台补生成副本；
+此脚本用于为已有图片一次性生成，避免首批访问仍然返回 JPEG。
+
+使用方法：
+python -m backend.generate_renditions                 # 生成所有缺失的副本
+python -m backend.generate_renditions --workers=8     # 指定并行进程数
+python -m backend.generate_renditions --force         # 重新生成已有副本（调整编码参数后使用）
+"""
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from backend.database import SessionLocal
+from backend import crud, models
+from backend.utils.cli import get_option
+from backend.utils.image_storage import image_storage
+from backend.utils.image_renditions import rendition_store, encode_rendition, SUPPORTED_FORMATS
+
+BATCH_SIZE = 100
+
+
+def _load_source(db, image_id: int, thumbnail: bool, digest: str):
+    """读取源 JPEG（文件优先，其次数据库 BLOB）"""
+    path = image_storage.files.locate(digest)
+    if path:
+        return path.read_bytes()
+    return crud.read_image_blob(db, image_id, thumbnail)
+
+
+def generate_renditions(workers: int = None, force: bool = False) -> int:
+    """
+    为全部截图（原图和缩略图）生成缺失的副本
+
+    Returns:
+        新生成的副本数
+    """
+    if not SUPPORTED_FORMATS:
+        print("⚠️ 当前环境的 Pillow 不支持 WebP/AVIF 编码，无需生成副本")
+        return 0
+
+    db = SessionLocal()
+    try:
+        # (图片ID, 是否缩略图, 内容哈希)，相同内容只处理一次
+        sources = {}
+        for image_id, image_hash, thumbnail_hash in db.query(
+            models.PaperImage.id, models.PaperImage.image_hash, models.PaperImage.thumbnail_hash
+        ).order_by(models.PaperImage.id).yield_per(1000):
+            if image_hash:
+                sources.setdefault(image_hash, (image_id, False))
+            if thumbnail_hash:
+                sources.setdefault(thumbnail_hash, (image_id, True))
+
+        tasks = [
+            (digest, image_id, thumbnail, fmt)
+            for digest, (image_id, thumbnail) in sources.items()
+            for fmt in SUPPORTED_FORMATS
+            if force or not rendition_store.exists(digest, fmt)
+        ]
+        print(f"开始生成 {len(tasks)} 个副本（格式: {', '.join(SUPPORTED_FORMATS)}）...")
+        if not tasks:
+            return 0
+
+        generated = 0
+        saved_bytes = 0
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for start in range(0, len(tasks), BATCH_SIZE):
+                batch = tasks[start:start + BATCH_SIZE]
+                # 每批只在内存中保留一批源图
+                loaded = []
+                for digest, image_id, thumbnail, fmt in batch:
+                    source = _load_source(db, image_id, thumbnail, digest)
+                    if source:
+                        loaded.append((digest, fmt, source))
+
+                results = pool.map(
+                    encode_rendition,
+                    [source for _, _, source in loaded],
+                    [fmt for _, fmt, _ in loaded]
+                )
+                for (digest, fmt, source), data in zip(loaded, results):
+                    rendition_store.put(digest, fmt, data)
+                    if data:
+                        generated += 1
+                        saved_bytes += len(source) - len(data)
+                print(f"已处理 {min(start + BATCH_SIZE, len(tasks))}/{len(tasks)} 个...")
+
+        print(f"✓ 副本生成完成：{generated} 个，相比 JPEG 节省 {saved_bytes / 1024 / 1024:.2f} MB")
+        return generated
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    generate_renditions(
+        workers=get_option("workers", os.cpu_count() or 1),
+        force="--force" in sys.argv
+    )
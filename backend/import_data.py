@@ -11,6 +11,7 @@ from sqlalchemy.orm import Session
 
 from backend.database import SessionLocal, engine
 from backend import models, crud
+from backend.utils.image_storage import image_storage
 
 
 def get_all_element_symbols(db: Session):
@@ -183,7 +184,7 @@ def import_all_data(input_file: str = "data/data_export.json", clear_existing: b
         # 4. 导入截图
         print("导入文献截图...")
         imported_images = 0
-        from backend.utils.image_processor import process_image
+        from backend.utils.image_processor import process_image, image_processor
 
         for img_data in data.get("paper_images", []):
             new_paper_id = paper_id_mapping.get(img_data.get("paper_id"))
@@ -191,6 +192,7 @@ def import_all_data(input_file: str = "data/data_export.json", clear_existing: b
 
             image_bin = None
             thumb_bin = None
+            rendition_version = None
 
             # 优先从文件路径读取
             file_path = img_data.get("file_path")
@@ -198,6 +200,7 @@ def import_all_data(input_file: str = "data/data_export.json", clear_existing: b
                 with open(file_path, 'rb') as f:
                     raw_data = f.read()
                     image_bin, thumb_bin = process_image(raw_data)
+                    rendition_version = image_processor.rendition_version
             # 否则从 Base64 读取
             elif "image_data" in img_data:
                 image_bin = base64.b64decode(img_data["image_data"])
@@ -209,11 +212,10 @@ def import_all_data(input_file: str = "data/data_export.json", clear_existing: b
             if image_bin and thumb_bin:
                 image = models.PaperImage(
                     paper_id=new_paper_id,
-                    image_data=image_bin,
-                    thumbnail_data=thumb_bin,
                     image_order=img_data["image_order"],
-                    file_size=len(image_bin)
+                    rendition_version=rendition_version
                 )
+                image_storage.store(image, image_bin, thumb_bin)
                 db.add(image)
                 imported_images += 1
 
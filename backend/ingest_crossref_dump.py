@@ -0,0 +1,137 @@
+"""
+从 CrossRef 数据转储构建离线DOI索引
+
+支持的文件（可直接传目录，递归查找；均可为 .gz 压缩）：
+- .jsonl：每行一条 work 记录（或一条 API 响应 {"message": {...}}）
+- .json：CrossRef 公共数据文件 {"items": [...]}、API 列表响应 {"message": {"items": [...]}} 或单条 work
+
+文件逐个、逐行流式读取，每批提交一次；重复导入同一DOI以后导入的为准。
+
+使用方法：
+python -m backend.ingest_crossref_dump /data/crossref/                     # 导入目录下全部转储文件
+python -m backend.ingest_crossref_dump works.jsonl.gz --batch=20000        # 指定每批写入条数
+python -m backend.ingest_crossref_dump /data/crossref/ --index=/tmp/doi_index.db --optimize
+
+导入完成后无需重启服务；设置 DOI_INDEX_ONLY=1 时解析器只使用离线索引，不访问 CrossRef。
+"""
+import gzip
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Iterator, List
+
+from backend.utils.cli import get_option
+from backend.utils.doi_index import DOI_INDEX_PATH, DoiIndexWriter
+from backend.utils.doi_resolver import extract_metadata, normalize_doi
+
+BATCH_SIZE = 5000
+DUMP_SUFFIXES = (".json", ".jsonl", ".json.gz", ".jsonl.gz")
+
+
+def _open_text(path: Path):
+    if path.name.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def _unwrap(document) -> Iterator[dict]:
+    """从不同形式的 JSON 文档中取出 work 记录"""
+    if isinstance(document, list):
+        yield from document
+        return
+    if not isinstance(document, dict):
+        return
+    if "message" in document:
+        yield from _unwrap(document["message"])
+    elif "items" in document:
+        yield from document["items"]
+    elif "DOI" in document:
+        yield document
+
+
+def iter_works(path: Path) -> Iterator[dict]:
+    """流式读取一个转储文件中的 work 记录"""
+    with _open_text(path) as f:
+        if ".jsonl" in path.name:
+            for line_no, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield from _unwrap(json.loads(line))
+                except json.JSONDecodeError as e:
+                    print(f"  ⚠️ {path.name} 第 {line_no} 行解析失败: {e}")
+        else:
+            # 公共数据文件单个通常只有几 MB，整体解析
+            yield from _unwrap(json.load(f))
+
+
+def find_dump_files(paths: List[str]) -> List[Path]:
+    files = []
+    for raw in paths:
+        path = Path(raw)
+        if path.is_dir():
+            files.extend(sorted(p for p in path.rglob("*") if p.is_file() and p.name.endswith(DUMP_SUFFIXES)))
+        elif path.is_file():
+            files.append(path)
+        else:
+            print(f"  ⚠️ 路径不存在: {raw}")
+    return files
+
+
+def ingest(paths: List[str], index_path: str = DOI_INDEX_PATH, batch_size: int = BATCH_SIZE,
+           optimize: bool = False) -> int:
+    """
+    导入转储文件到离线索引
+
+    Returns:
+        写入的记录数
+    """
+    files = find_dump_files(paths)
+    print(f"开始导入 {len(files)} 个转储文件到 {index_path} ...")
+
+    writer = DoiIndexWriter(index_path)
+    written = 0
+    skipped = 0
+    started = time.monotonic()
+    batch = []
+    try:
+        for file_no, path in enumerate(files, start=1):
+            for work in iter_works(path):
+                doi = normalize_doi(work.get("DOI") or "")
+                if not doi:
+                    skipped += 1
+                    continue
+                batch.append((doi, extract_metadata(work)))
+                if len(batch) >= batch_size:
+                    written += writer.write_batch(batch)
+                    batch = []
+            elapsed = time.monotonic() - started
+            print(f"已处理 {file_no}/{len(files)} 个文件，写入 {written + len(batch)} 条"
+                  f"（{(written + len(batch)) / elapsed if elapsed else 0:.0f} 条/秒）")
+
+        if batch:
+            written += writer.write_batch(batch)
+        if optimize:
+            print("正在整理索引文件...")
+            writer.optimize()
+    finally:
+        writer.close()
+
+    print(f"✓ 导入完成：写入 {written} 条，跳过缺少DOI的记录 {skipped} 条")
+    return written
+
+
+if __name__ == "__main__":
+    inputs = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    if not inputs:
+        print("用法: python3 -m backend.ingest_crossref_dump <转储文件或目录>... "
+              "[--index=路径] [--batch=5000] [--optimize]")
+        sys.exit(1)
+    ingest(
+        inputs,
+        index_path=get_option("index", DOI_INDEX_PATH),
+        batch_size=get_option("batch", BATCH_SIZE),
+        optimize="--optimize" in sys.argv
+    )
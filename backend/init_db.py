@@ -2,8 +2,13 @@
 数据库初始化脚本
 创建所有表并填充118个元素数据
 """
+from sqlalchemy import text
+
 from backend.database import engine, SessionLocal, Base
 from backend.models import Element
+from backend.migrations.schema_upgrade import upgrade_schema
+from backend.migrate_images import blob_columns_not_null
+from backend.utils.image_storage import image_storage
 
 
 # 118个元素数据（原子序数、符号、英文名、中文名）
@@ -133,10 +138,20 @@ def init_database():
     """初始化数据库：创建表并填充元素数据"""
     print("正在创建数据库表...")
 
-    # 创建所有表
-    Base.metadata.create_all(bind=engine)
+    # 创建所有表；新建的数据库直接启用增量自动回收（只能在建表前设置）
+    with engine.begin() as conn:
+        if conn.execute(text("SELECT 1 FROM sqlite_master LIMIT 1")).first() is None:
+            conn.execute(text("PRAGMA auto_vacuum = INCREMENTAL"))
+        Base.metadata.create_all(bind=conn)
     print("✓ 数据库表创建完成")
 
+    # 为旧数据库补齐新增列
+    upgrade_schema(engine)
+
+    # 旧表结构的 BLOB 列为 NOT NULL：文件存储的记录写入空 BLOB，迁移后重建表才会改为 NULL
+    if image_storage.name == "filesystem" and blob_columns_not_null(engine):
+        print("⚠️  已启用文件存储后端，但 paper_images 仍是旧表结构，建议运行: python -m backend.migrate_images")
+
     # 创建数据库会话
     db = SessionLocal()
 
@@ -7,8 +7,13 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 from pathlib import Path
+import asyncio
+import os
 
-from backend.api import elements, compounds, papers, admin, auth_routes, tc_predict
+from backend.api import elements, compounds, papers, admin, auth_routes, tc_predict, events
+from backend.utils.image_processor import get_executor, shutdown_executor
+from backend.utils.upload_limits import RequestSizeLimitMiddleware
+from backend.utils.doi_resolver import doi_resolver
 
 # 创建FastAPI应用
 app = FastAPI(
@@ -26,6 +31,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 限制上传请求体大小（在解析表单之前拒绝超大请求）
+app.add_middleware(RequestSizeLimitMiddleware)
+
 # 注册API路由
 app.include_router(elements.router)
 app.include_router(compounds.router)
@@ -33,6 +41,7 @@ app.include_router(papers.router)
 app.include_router(auth_routes.router)  # 认证API
 app.include_router(admin.router)  # 管理员API
 app.include_router(tc_predict.router)  # Tc 预测 API
+app.include_router(events.router)  # 实时事件推送（SSE）
 
 # 挂载静态文件目录
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -177,6 +186,10 @@ def health_check():
 
 
 # 启动信息
+# 启动时创建的后台任务（保留引用，关闭时取消）
+_background_tasks = set()
+
+
 @app.on_event("startup")
 async def startup_event():
     """应用启动时自动初始化数据库"""
@@ -194,6 +207,24 @@ async def startup_event():
         print(f"⚠️  数据库初始化失败: {e}")
         print("应用将继续启动，但可能无法正常工作")
 
+    # 预先启动图片处理进程池
+    get_executor()
+
+    # 创建 CrossRef 长连接客户端
+    await doi_resolver.start()
+
+    # 图片参数调整后，在后台线程中重新生成过期的缩略图（不阻塞启动）
+    if os.environ.get("REGENERATE_THUMBNAILS_ON_STARTUP") == "1":
+        from backend.regenerate_thumbnails import regenerate_thumbnails
+        asyncio.get_running_loop().run_in_executor(
+            None, regenerate_thumbnails, int(os.environ.get("REGENERATE_THUMBNAILS_WORKERS", 2))
+        )
+
+    # 在后台补全批量上传/手动录入的占位元数据（与请求共用 CrossRef 客户端和限速）
+    if os.environ.get("ENRICH_METADATA_ON_STARTUP") == "1":
+        from backend.enrich_metadata import run_enrichment_worker
+        _background_tasks.add(asyncio.create_task(run_enrichment_worker()))
+
     print("=" * 60)
     print("✅ 超导文献数据库服务启动成功！")
     print("=" * 60)
@@ -203,6 +234,15 @@ async def startup_event():
     print("=" * 60)
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """应用关闭时释放后台资源"""
+    for task in _background_tasks:
+        task.cancel()
+    shutdown_executor()
+    await doi_resolver.close()
+
+
 if __name__ == "__main__":
     import uvicorn
     import os
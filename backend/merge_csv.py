@@ -1,3 +1,4 @@
+import codecs
 import csv
 import json
 import re
@@ -97,20 +98,20 @@ def to_float(val):
     except ValueError:
         return None
 
-def parse_rows(rows):
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(loc) for loc in item['loc'])}: {item['msg']}" for item in error.errors())
+
+def iter_records(rows):
     """
-    通用行解析逻辑
-    rows: 迭代器，每项是一个列表/元组
-    返回: (added_papers, added_points, db_data_fragment)
+    逐行解析并校验（生成器）
+    rows: 迭代器，每项是一个列表/元组；第一行是表头
+    产出: ("paper", paper_dict, data_points) 或 ("error", {"row", "doi", "detail"}, None)
     """
-    db_data = {"papers": [], "paper_data": []}
-    added_papers = 0
-    added_points = 0
-    
     # 假设第一行是表头，跳过
     it = iter(rows)
-    next(it, None) 
+    next(it, None)
 
+    added_papers = 0
     for row_idx, row in enumerate(it, start=2):
         if not row or len(row) < 5: continue
         
@@ -136,6 +137,7 @@ def parse_rows(rows):
             )
         except ValidationError as e:
             print(f"❌ 第 {row_idx} 行基本信息校验失败: {e}")
+            yield "error", {"row": row_idx, "doi": doi, "detail": _validation_message(e)}, None
             continue
 
         # 2. 物理数据
@@ -161,54 +163,77 @@ def parse_rows(rows):
             except ValidationError:
                 continue
 
-        if not current_row_data_points: continue
+        if not current_row_data_points:
+            yield "error", {"row": row_idx, "doi": doi, "detail": "没有有效的物理数据（至少需要 Tc）"}, None
+            continue
 
         # 3. 组装
         paper_id_temp = added_papers + 1000000 # 临时 ID，仅用于 fragment
         paper_dict = validated_paper.model_dump()
         paper_dict["id_temp"] = paper_id_temp
+        paper_dict["row"] = row_idx
         paper_dict["element_symbols"] = "-".join(element_list)
         paper_dict["authors"] = json.dumps(["Batch Import"])
         paper_dict["year"] = datetime.now().year
         paper_dict["title"] = f"Imported: {formula}"
         paper_dict["created_at"] = datetime.now().isoformat()
-        
-        db_data["papers"].append(paper_dict)
-        
+
         for dp in current_row_data_points:
             dp["paper_id_temp"] = paper_id_temp
-            db_data["paper_data"].append(dp)
-            added_points += 1
-        
+
+        added_papers += 1
+        yield "paper", paper_dict, current_row_data_points
+
+def parse_rows(rows):
+    """
+    通用行解析逻辑
+    rows: 迭代器，每项是一个列表/元组
+    返回: (added_papers, added_points, db_data_fragment)
+    """
+    db_data = {"papers": [], "paper_data": [], "errors": []}
+    added_papers = 0
+    added_points = 0
+
+    for kind, item, data_points in iter_records(rows):
+        if kind == "error":
+            db_data["errors"].append(item)
+            continue
+        db_data["papers"].append(item)
+        db_data["paper_data"].extend(data_points)
+        added_points += len(data_points)
         added_papers += 1
 
     return added_papers, added_points, db_data
 
-def process_file(file_content, filename):
+def iter_file_rows(source, filename):
     """
-    处理上传的文件
-    file_content: bytes
-    filename: 文件名
+    逐行读取上传文件（生成器），不把整个文件展开到内存
+    source: bytes 或可读的二进制文件对象（如 UploadFile.file）
+    filename: 文件名（按扩展名判断格式）
     """
     ext = Path(filename).suffix.lower()
-    rows = []
-    
+    if ext not in ('.xlsx', '.csv', '.txt'):
+        raise ValueError("不支持的文件格式")
+    f = io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+
     if ext == '.xlsx':
-        f = io.BytesIO(file_content)
-        wb = openpyxl.load_workbook(f, data_only=True)
-        ws = wb.active
-        for row in ws.iter_rows(values_only=True):
-            rows.append(row)
-    elif ext in ['.csv', '.txt']:
-        text = file_content.decode('utf-8-sig')
-        f = io.StringIO(text)
-        reader = csv.reader(f)
-        for row in reader:
-            rows.append(row)
+        # 只读模式按需解析工作表 XML，不构建整个工作簿的单元格对象
+        wb = openpyxl.load_workbook(f, read_only=True, data_only=True)
+        try:
+            yield from wb.active.iter_rows(values_only=True)
+        finally:
+            wb.close()
     else:
-        raise ValueError("不支持的文件格式")
-        
-    return parse_rows(rows)
+        # 增量解码：按块读取字节并解码，csv.reader 逐行产出（不关闭调用方传入的文件对象）
+        yield from csv.reader(codecs.getreader('utf-8-sig')(f))
+
+def process_file(file_content, filename):
+    """
+    处理上传的文件
+    file_content: bytes 或可读的二进制文件对象
+    filename: 文件名
+    """
+    return parse_rows(iter_file_rows(file_content, filename))
 
 if __name__ == "__main__":
     print(CSV_EXAMPLE_TEXT)
@@ -223,9 +248,7 @@ if __name__ == "__main__":
         out_path = sys.argv[2] if len(sys.argv) > 2 else "data/data_export.json"
         
         with open(in_path, 'rb') as f:
-            content = f.read()
-        
-        added_p, added_d, fragment = process_file(content, in_path)
+            added_p, added_d, fragment = process_file(f, in_path)
         
         # 合并逻辑 (CLI 版本依然写到 JSON)
         dest = Path(out_path)
@@ -242,6 +265,7 @@ if __name__ == "__main__":
         temp_to_real = {}
         for p in fragment["papers"]:
             old_temp = p.pop("id_temp")
+            p.pop("row", None)
             p["id"] = next_p_id
             temp_to_real[old_temp] = next_p_id
             full_db["papers"].append(p)
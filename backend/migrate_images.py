@@ -0,0 +1,204 @@
+"""
+数据库迁移脚本：将 paper_images 中的图片 BLOB 迁移到内容寻址文件仓库
+
+使用方法：
+python -m backend.migrate_images             # 迁移全部图片
+python -m backend.migrate_images --vacuum    # 迁移后执行 VACUUM 回收数据库文件空间
+python -m backend.migrate_images --gc        # 清理仓库中未被任何记录引用的文件
+python -m backend.migrate_images --hashes    # 仅为缺少内容哈希的旧记录补算哈希（不迁移）
+
+迁移完成后设置环境变量 IMAGE_STORAGE=filesystem，新上传的图片将直接写入文件仓库
+"""
+import os
+import sys
+import time
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlalchemy.orm import undefer
+from sqlalchemy.engine import Engine
+
+from backend.database import SessionLocal, engine
+from backend import models
+from backend.utils.image_storage import image_storage, content_hash, IMAGE_STORE_DIR
+from backend.utils.image_renditions import rendition_store
+
+BATCH_SIZE = 100
+# 垃圾回收跳过最近修改的文件：并发上传先写文件、后提交数据库记录
+IMAGE_GC_GRACE_SECONDS = float(os.environ.get("IMAGE_GC_GRACE_SECONDS", 3600))
+BLOB_COLUMNS = ("image_data", "thumbnail_data")
+
+
+def blob_columns_not_null(bind: Engine) -> bool:
+    """旧版表结构中 BLOB 列为 NOT NULL，需要重建表后才能清空"""
+    with bind.connect() as conn:
+        columns = conn.execute(text("PRAGMA table_info(paper_images)")).fetchall()
+    return any(col[1] in BLOB_COLUMNS and col[3] for col in columns)
+
+
+def rebuild_paper_images_table(bind: Engine) -> None:
+    """
+    按当前模型重建 paper_images 表（去掉 BLOB 列的 NOT NULL 约束）
+    应在 BLOB 已清空后执行，此时复制数据的代价很小
+    """
+    table = models.PaperImage.__table__
+    with bind.begin() as conn:
+        old_columns = {row[1] for row in conn.execute(text("PRAGMA table_info(paper_images)"))}
+        index_names = [row[0] for row in conn.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'index' "
+            "AND tbl_name = 'paper_images' AND sql IS NOT NULL"
+        ))]
+        for name in index_names:
+            conn.execute(text(f'DROP INDEX "{name}"'))
+
+        conn.execute(text("ALTER TABLE paper_images RENAME TO paper_images_old"))
+        table.create(conn)
+
+        columns = [c.name for c in table.columns if c.name in old_columns]
+        select_list = [
+            f"NULLIF({name}, x'')" if name in BLOB_COLUMNS else name
+            for name in columns
+        ]
+        conn.execute(text(
+            f"INSERT INTO paper_images ({', '.join(columns)}) "
+            f"SELECT {', '.join(select_list)} FROM paper_images_old"
+        ))
+        conn.execute(text("DROP TABLE paper_images_old"))
+    print("✓ 已重建 paper_images 表（BLOB 列允许为空）")
+
+
+def migrate_images_to_files(vacuum: bool = False):
+    """将所有仍保存在数据库中的图片写入文件仓库，并清空对应 BLOB"""
+    db = SessionLocal()
+    files = image_storage.files
+    not_null = blob_columns_not_null(engine)
+    # NOT NULL 约束下先写入空 BLOB，重建表时再转为 NULL
+    empty_value = b"" if not_null else None
+
+    try:
+        pending = db.query(models.PaperImage.id).filter(
+            models.PaperImage.image_data.isnot(None),
+            models.PaperImage.image_data != b""
+        ).order_by(models.PaperImage.id).all()
+        pending_ids = [row[0] for row in pending]
+        print(f"开始迁移 {len(pending_ids)} 张图片到 {IMAGE_STORE_DIR} ...")
+
+        migrated = 0
+        moved_bytes = 0
+        for start in range(0, len(pending_ids), BATCH_SIZE):
+            batch_ids = pending_ids[start:start + BATCH_SIZE]
+            images = db.query(models.PaperImage).options(
+                undefer(models.PaperImage.image_data), undefer(models.PaperImage.thumbnail_data)
+            ).filter(models.PaperImage.id.in_(batch_ids)).all()
+            for image in images:
+                image.image_hash = files.put(image.image_data)
+                if image.thumbnail_data:
+                    image.thumbnail_hash = files.put(image.thumbnail_data)
+                moved_bytes += len(image.image_data) + len(image.thumbnail_data or b"")
+                image.image_data = empty_value
+                image.thumbnail_data = empty_value
+                migrated += 1
+            # 每批提交一次：中断后重新运行会从未迁移的记录继续
+            db.commit()
+            db.expunge_all()
+            print(f"已迁移 {migrated}/{len(pending_ids)} 张...")
+
+        print(f"✓ 图片迁移完成，共移出 {moved_bytes / 1024 / 1024:.2f} MB")
+    except Exception as e:
+        print(f"迁移失败: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    if not_null:
+        rebuild_paper_images_table(engine)
+
+    if vacuum:
+        print("正在执行 VACUUM（期间数据库不可写）...")
+        with engine.connect() as conn:
+            conn.execution_options(isolation_level="AUTOCOMMIT").execute(text("VACUUM"))
+        print("✓ VACUUM 完成")
+
+
+def backfill_image_hashes() -> int:
+    """为缺少内容哈希的旧记录补算哈希（用于 ETag），图片仍保留在原处"""
+    db = SessionLocal()
+    try:
+        pending_ids = [row[0] for row in db.query(models.PaperImage.id).filter(
+            (models.PaperImage.image_hash.is_(None)) | (models.PaperImage.thumbnail_hash.is_(None))
+        ).order_by(models.PaperImage.id).all()]
+        print(f"开始为 {len(pending_ids)} 张图片补算内容哈希...")
+
+        for start in range(0, len(pending_ids), BATCH_SIZE):
+            batch_ids = pending_ids[start:start + BATCH_SIZE]
+            for image in db.query(models.PaperImage).options(
+                undefer(models.PaperImage.image_data), undefer(models.PaperImage.thumbnail_data)
+            ).filter(models.PaperImage.id.in_(batch_ids)).all():
+                if not image.image_hash and image.image_data:
+                    image.image_hash = content_hash(image.image_data)
+                if not image.thumbnail_hash and image.thumbnail_data:
+                    image.thumbnail_hash = content_hash(image.thumbnail_data)
+            db.commit()
+            db.expunge_all()
+            print(f"已处理 {min(start + BATCH_SIZE, len(pending_ids))}/{len(pending_ids)} 张...")
+
+        print("✓ 内容哈希补算完成")
+        return len(pending_ids)
+    except Exception as e:
+        print(f"补算失败: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def _modified_before(path: Path, cutoff: float) -> bool:
+    try:
+        return path.stat().st_mtime < cutoff
+    except FileNotFoundError:
+        return False
+
+
+def collect_garbage(grace_seconds: float = IMAGE_GC_GRACE_SECONDS) -> int:
+    """
+    删除文件仓库中未被任何 paper_images 记录引用的文件
+
+    只删除在引用快照之前 grace_seconds 秒就已存在的文件：
+    上传过程中已写入仓库、但数据库记录尚未提交的文件不在快照中，不能删除
+    """
+    cutoff = time.time() - grace_seconds
+    db = SessionLocal()
+    try:
+        referenced = set()
+        for image_hash, thumbnail_hash in db.query(
+            models.PaperImage.image_hash, models.PaperImage.thumbnail_hash
+        ).yield_per(1000):
+            referenced.update(h for h in (image_hash, thumbnail_hash) if h)
+    finally:
+        db.close()
+
+    files = image_storage.files
+    removed = 0
+    for digest in list(files.iter_digests()):
+        if digest in referenced or not _modified_before(files.path_for(digest), cutoff):
+            continue
+        if files.delete(digest):
+            removed += 1
+
+    # WebP/AVIF 副本随源图一起清理
+    for digest, path in list(rendition_store.iter_files()):
+        if digest not in referenced and _modified_before(path, cutoff):
+            path.unlink(missing_ok=True)
+            removed += 1
+    print(f"✓ 已清理 {removed} 个未引用的文件")
+    return removed
+
+
+if __name__ == "__main__":
+    if "--gc" in sys.argv:
+        collect_garbage()
+    elif "--hashes" in sys.argv:
+        backfill_image_hashes()
+    else:
+        migrate_images_to_files(vacuum="--vacuum" in sys.argv)
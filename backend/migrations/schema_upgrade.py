@@ -0,0 +1,64 @@
+"""
+表结构增量升级
+create_all 只会创建缺失的表，不会为已有表补充新列；这里按需执行 ALTER TABLE 补列并回填
+"""
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+
+# (表名, 列名, 列类型DDL, 补列后执行的回填SQL)
+COLUMN_UPGRADES = [
+    (
+        "papers", "updated_at", "DATETIME",
+        "UPDATE papers SET updated_at = created_at WHERE updated_at IS NULL"
+    ),
+    (
+        "paper_data", "updated_at", "DATETIME",
+        "UPDATE paper_data SET updated_at = "
+        "(SELECT created_at FROM papers WHERE papers.id = paper_data.paper_id) "
+        "WHERE updated_at IS NULL"
+    ),
+    ("paper_images", "image_hash", "VARCHAR(64)", None),
+    ("paper_images", "thumbnail_hash", "VARCHAR(64)", None),
+    ("paper_images", "perceptual_hash", "VARCHAR(16)", None),
+    ("paper_images", "rendition_version", "VARCHAR(16)", None),
+    ("papers", "metadata_enriched_at", "DATETIME", None),
+]
+
+# 补列后需要的索引（名称与模型 index=True 生成的一致，新库不会重复创建）
+INDEX_UPGRADES = [
+    "CREATE INDEX IF NOT EXISTS ix_papers_updated_at ON papers (updated_at)",
+    "CREATE INDEX IF NOT EXISTS ix_paper_data_updated_at ON paper_data (updated_at)",
+    "CREATE INDEX IF NOT EXISTS ix_paper_images_image_hash ON paper_images (image_hash)",
+    "CREATE INDEX IF NOT EXISTS ix_paper_images_perceptual_hash ON paper_images (perceptual_hash)",
+]
+
+
+def upgrade_schema(engine: Engine) -> int:
+    """
+    为已有数据库补齐模型中新增的列和索引
+
+    Returns:
+        新增的列数
+    """
+    inspector = inspect(engine)
+    added = 0
+
+    with engine.begin() as conn:
+        for table, column, ddl, backfill in COLUMN_UPGRADES:
+            if not inspector.has_table(table):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table)}
+            if column in existing:
+                continue
+
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+            if backfill:
+                conn.execute(text(backfill))
+            added += 1
+            print(f"✓ 已为 {table} 表补充列 {column}")
+
+        for statement in INDEX_UPGRADES:
+            conn.execute(text(statement))
+
+    return added
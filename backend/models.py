@@ -2,7 +2,7 @@
 数据库模型定义
 """
 from sqlalchemy import Column, Integer, String, Text, BLOB, DateTime, ForeignKey, UniqueConstraint, Boolean, Float
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.sql import func
 from backend.database import Base
 import datetime
@@ -104,8 +104,10 @@ class Paper(Base):
     reviewed_at = Column(DateTime)  # 审核时间
     review_comment = Column(Text)  # 审核意见/拒绝理由
     show_in_chart = Column(Boolean, default=False, nullable=False)  # 是否用于前端图表
+    metadata_enriched_at = Column(DateTime)  # 占位元数据被 CrossRef 结果补全的时间，补全过的文献不再重复处理
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow, index=True)  # 最后修改时间（增量同步）
 
     # 关系
     compound = relationship("Compound", back_populates="papers")
@@ -131,6 +133,7 @@ class PaperData(Base):
     omega_log = Column(Float)  # ω_log
     n_ef = Column(Float)       # N(E_F)
     s_factor = Column(Float)   # s因子 (用户自定义参数)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow, index=True)  # 最后修改时间（增量同步）
     # 关系
     paper = relationship("Paper", back_populates="physical_parameters")
     def __repr__(self):
@@ -142,8 +145,13 @@ class PaperImage(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     paper_id = Column(Integer, ForeignKey("papers.id", ondelete="CASCADE"), nullable=False, index=True)
-    image_data = Column(BLOB, nullable=False)  # 原图二进制数据
-    thumbnail_data = Column(BLOB, nullable=False)  # 缩略图二进制数据
+    # 二进制列延迟加载：列表、计数、缩略图请求只读取所需的小列
+    image_data = deferred(Column(BLOB))  # 原图二进制数据（文件存储后端下为空）
+    thumbnail_data = deferred(Column(BLOB))  # 缩略图二进制数据（文件存储后端下为空）
+    image_hash = Column(String(64), index=True)  # 原图内容哈希（SHA-256）
+    thumbnail_hash = Column(String(64))  # 缩略图内容哈希（SHA-256）
+    perceptual_hash = Column(String(16), index=True)  # 感知哈希（dHash），用于识别重复截图
+    rendition_version = Column(String(16))  # 生成压缩图/缩略图时的参数指纹，参数调整后据此重新生成
     image_order = Column(Integer, nullable=False)  # 图片顺序（1-5）
     file_size = Column(Integer)  # 文件大小（字节）
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -153,3 +161,32 @@ class PaperImage(Base):
 
     def __repr__(self):
         return f"<PaperImage paper_id={self.paper_id} order={self.image_order}>"
+
+
+class DeletedRecord(Base):
+    """删除记录表（墓碑） - 供增量同步接口下发删除事件"""
+    __tablename__ = "deleted_records"
+
+    id = Column(Integer, primary_key=True, index=True)
+    table_name = Column(String(50), nullable=False)  # 被删除记录所在表: papers 或 paper_data
+    record_id = Column(Integer, nullable=False)  # 被删除记录的ID
+    paper_id = Column(Integer)  # 所属文献ID（paper_data 记录）
+    deleted_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<DeletedRecord {self.table_name}#{self.record_id}>"
+
+
+class DoiMetadata(Base):
+    """DOI 元数据缓存表 - 避免重复请求 CrossRef（同一文献常被录入到多个元素组合下）"""
+    __tablename__ = "doi_metadata"
+
+    doi = Column(String(200), primary_key=True)  # 规范化后的DOI（小写，去掉 https://doi.org/ 前缀）
+    found = Column(Boolean, nullable=False, default=True)  # False 表示 CrossRef 返回 404（负缓存）
+    metadata_json = Column(Text)  # 提取后的元数据（JSON）
+    raw_response = Column(Text)  # CrossRef 原始响应中的 message 字段（JSON）
+    fetched_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)  # 过期后重新请求
+
+    def __repr__(self):
+        return f"<DoiMetadata {self.doi} found={self.found}>"
@@ -0,0 +1,152 @@
+"""
+按当前图片参数重新生成截图的缩略图（及超出最大尺寸的原图）
+
+截图记录保存了生成时的参数指纹（rendition_version）。调整 THUMBNAIL_SIZE、IMAGE_MAX_SIZE、
+JPEG_QUALITY、THUMBNAIL_QUALITY 等环境变量后，运行此脚本即可只处理指纹过期的记录：
+多进程并行生成，每批提交一次，中断后重新运行会从未处理的记录继续；单条记录失败只跳过该条。
+
+使用方法：
+python -m backend.regenerate_thumbnails                # 处理全部过期记录
+python -m backend.regenerate_thumbnails --workers=8    # 指定并行进程数
+python -m backend.regenerate_thumbnails --dry-run      # 只统计需要处理的数量
+
+也可以设置 REGENERATE_THUMBNAILS_ON_STARTUP=1，服务启动后在后台自动执行。
+文件存储下旧缩略图会留在仓库中，处理完成后运行 python -m backend.migrate_images --gc 清理。
+"""
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+from sqlalchemy import or_
+from sqlalchemy.orm import undefer
+
+from backend.database import SessionLocal
+from backend import models
+from backend.utils.cli import get_option
+from backend.utils.image_processor import image_processor
+from backend.utils.image_storage import image_storage, content_hash
+
+BATCH_SIZE = 50
+
+
+def _regenerate(image_data: bytes) -> Tuple[Optional[bytes], Optional[bytes], Optional[str]]:
+    """在工作进程中执行，返回 (新原图或None, 新缩略图, 错误信息)"""
+    try:
+        compressed, thumbnail = image_processor.regenerate(image_data)
+        return compressed, thumbnail, None
+    except ValueError as e:
+        return None, None, str(e)
+
+
+def _store_regenerated(db, image, new_data: bytes, thumbnail: bytes, version: str) -> None:
+    """
+    写回重新生成的内容
+
+    内容已在文件仓库中（BLOB 为空，如去重合并过）或与其他截图相同时，继续写入仓库，
+    BLOB 列保持为空 BLOB，不会写入 NULL
+    """
+    in_files = not image.image_data
+    shared = in_files or db.query(models.PaperImage.id).filter(
+        models.PaperImage.id != image.id,
+        models.PaperImage.image_hash == content_hash(new_data)
+    ).first() is not None
+    image_storage.store(image, new_data, thumbnail, shared=shared)
+    image.rendition_version = version
+    db.flush()
+
+
+def _outdated_filter(version: str):
+    return or_(
+        models.PaperImage.rendition_version.is_(None),
+        models.PaperImage.rendition_version != version
+    )
+
+
+def count_outdated(db=None) -> int:
+    """统计参数指纹过期的截图数"""
+    own_session = db is None
+    db = db or SessionLocal()
+    try:
+        return db.query(models.PaperImage.id).filter(
+            _outdated_filter(image_processor.rendition_version)
+        ).count()
+    finally:
+        if own_session:
+            db.close()
+
+
+def regenerate_thumbnails(workers: Optional[int] = None) -> int:
+    """
+    重新生成参数指纹过期的截图
+
+    Returns:
+        成功处理的截图数
+    """
+    version = image_processor.rendition_version
+    db = SessionLocal()
+    try:
+        pending_ids = [row[0] for row in db.query(models.PaperImage.id).filter(
+            _outdated_filter(version)
+        ).order_by(models.PaperImage.id).all()]
+        total = len(pending_ids)
+        print(f"开始重新生成 {total} 张截图（参数指纹 {version}）...")
+        if not total:
+            return 0
+
+        done = 0
+        failed = 0
+        started = time.monotonic()
+        # 使用 spawn 启动：服务启动时在线程中运行，不能在多线程进程中 fork
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            for start in range(0, total, BATCH_SIZE):
+                batch_ids = pending_ids[start:start + BATCH_SIZE]
+                images = db.query(models.PaperImage).options(
+                    undefer(models.PaperImage.image_data), undefer(models.PaperImage.thumbnail_data)
+                ).filter(models.PaperImage.id.in_(batch_ids)).all()
+
+                sources = [(image, image_storage.read(image)) for image in images]
+                sources = [(image, data) for image, data in sources if data]
+                results = pool.map(_regenerate, [data for _, data in sources])
+
+                for (image, data), (compressed, thumbnail, error) in zip(sources, results):
+                    if error:
+                        failed += 1
+                        print(f"  ⚠️ 图片 {image.id} 处理失败: {error}")
+                        continue
+                    try:
+                        # 每条记录一个保存点：单条写入失败只回滚这一条，不影响整批提交
+                        with db.begin_nested():
+                            _store_regenerated(db, image, compressed or data, thumbnail, version)
+                        done += 1
+                    except Exception as e:
+                        failed += 1
+                        print(f"  ⚠️ 图片 {image.id} 保存失败: {e}")
+
+                # 每批提交一次：中断后重新运行会跳过已处理的记录
+                db.commit()
+                db.expunge_all()
+
+                processed = min(start + BATCH_SIZE, total)
+                elapsed = time.monotonic() - started
+                rate = processed / elapsed if elapsed else 0
+                remaining = (total - processed) / rate if rate else 0
+                print(f"已处理 {processed}/{total} 张（{rate:.1f} 张/秒，预计剩余 {remaining:.0f} 秒）")
+
+        print(f"✓ 重新生成完成：成功 {done} 张，失败 {failed} 张")
+        return done
+    except Exception as e:
+        print(f"重新生成失败: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    if "--dry-run" in sys.argv:
+        print(f"需要重新生成的截图: {count_outdated()} 张（参数指纹 {image_processor.rendition_version}）")
+    else:
+        regenerate_thumbnails(workers=get_option("workers", os.cpu_count() or 1))
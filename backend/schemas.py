@@ -187,6 +187,8 @@ class ImageResponse(BaseModel):
     paper_id: int
     image_order: int
     file_size: int
+    image_hash: Optional[str] = None
+    thumbnail_hash: Optional[str] = None
     created_at: datetime
 
     class Config:
@@ -80,7 +80,8 @@ async def get_current_user(
         )
 
     email: str = payload.get("sub")
-    if email is None:
+    # 带 purpose 的是专用票据（如事件订阅票据），不能当作访问令牌使用
+    if email is None or payload.get("purpose"):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="无效的认证凭证",
@@ -0,0 +1,25 @@
+"""
+命令行参数工具
+维护脚本（python -m backend.xxx）共用的 --name=value 参数读取
+"""
+import sys
+from typing import Any
+
+
+def get_option(name: str, default: Any = None) -> Any:
+    """
+    读取 --name=value 形式的命令行参数
+
+    Args:
+        name: 参数名（不含 --）
+        default: 未提供时的默认值；不为 None 时参数值按默认值的类型转换
+
+    Returns:
+        参数值，未提供时返回 default
+    """
+    prefix = f"--{name}="
+    for arg in sys.argv[1:]:
+        if arg.startswith(prefix):
+            value = arg[len(prefix):]
+            return type(default)(value) if default is not None else value
+    return default
@@ -0,0 +1,122 @@
+"""
+离线DOI元数据索引
+由 CrossRef 数据转储导入（python -m backend.ingest_crossref_dump），保存在独立的 SQLite 文件中：
+- 表 works(doi PRIMARY KEY, metadata) WITHOUT ROWID，按规范化DOI聚簇存储，一次 B 树查找即可命中
+- metadata 只保存解析后的元数据（与在线解析结果字段相同），zlib 压缩
+
+索引文件不存在时所有查询都返回 None，解析器继续使用缓存表和 CrossRef API。
+"""
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from backend.database import DATABASE_PATH
+
+DOI_INDEX_PATH = os.environ.get("DOI_INDEX_PATH") or os.path.join(
+    os.path.dirname(DATABASE_PATH), "doi_index.db"
+)
+
+SCHEMA = "CREATE TABLE IF NOT EXISTS works (doi TEXT PRIMARY KEY, metadata BLOB NOT NULL) WITHOUT ROWID"
+
+
+def pack_metadata(metadata: Dict[str, Any]) -> bytes:
+    return zlib.compress(json.dumps(metadata, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def unpack_metadata(blob: bytes) -> Dict[str, Any]:
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+class DoiIndex:
+    """离线索引的只读查询端（进程内共用一个连接）"""
+
+    def __init__(self, path: str = DOI_INDEX_PATH):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        if self._conn is None:
+            if not os.path.exists(self.path):
+                return None
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            try:
+                conn.execute("SELECT 1 FROM works LIMIT 1")
+            except sqlite3.Error:
+                # 文件存在但尚未建表（正在首次导入）
+                conn.close()
+                return None
+            self._conn = conn
+        return self._conn
+
+    @property
+    def available(self) -> bool:
+        with self._lock:
+            return self._connection() is not None
+
+    def get(self, doi: str) -> Optional[Dict[str, Any]]:
+        """按规范化DOI查询元数据，未收录或索引不可用时返回 None"""
+        with self._lock:
+            try:
+                conn = self._connection()
+                if conn is None:
+                    return None
+                row = conn.execute("SELECT metadata FROM works WHERE doi = ?", (doi,)).fetchone()
+            except sqlite3.Error as e:
+                # 导入进程正在写入等情况：退回在线解析
+                print(f"DOI离线索引查询失败: {e}")
+                return None
+        return unpack_metadata(row[0]) if row else None
+
+    def count(self) -> int:
+        with self._lock:
+            conn = self._connection()
+            return conn.execute("SELECT COUNT(*) FROM works").fetchone()[0] if conn else 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class DoiIndexWriter:
+    """离线索引的写入端（导入脚本使用），按批提交"""
+
+    def __init__(self, path: str = DOI_INDEX_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        # 导入期间允许服务端并发读取；批量写入不需要每次 fsync
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(SCHEMA)
+        self.conn.commit()
+
+    def write_batch(self, rows: Iterable[Tuple[str, Dict[str, Any]]]) -> int:
+        """写入一批 (规范化DOI, 元数据)，同一DOI以后写入的为准"""
+        packed = [(doi, pack_metadata(metadata)) for doi, metadata in rows]
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO works (doi, metadata) VALUES (?, ?)", packed)
+        return len(packed)
+
+    def optimize(self) -> None:
+        """导入完成后整理文件：合并 WAL 并重建，减小体积、提高查询局部性"""
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self.conn.execute("VACUUM")
+
+    def close(self) -> None:
+        # 切回普通日志模式：只读连接打开 WAL 数据库需要 -shm 文件，服务重启后可能无法创建
+        try:
+            self.conn.execute("PRAGMA journal_mode=DELETE")
+        except sqlite3.Error:
+            # 服务仍持有读连接时无法切换，保持 WAL（-shm 文件仍在）
+            pass
+        self.conn.close()
+
+
+# 全局实例
+doi_index = DoiIndex()
@@ -1,56 +1,435 @@
 """
 DOI解析工具
-通过CrossRef API获取文献元数据
+依次查询本地离线索引（CrossRef 数据转储）、doi_metadata 缓存表和 CrossRef API
 """
+import asyncio
 import httpx
 import json
-from typing import Optional, Dict, Any
+import os
+import random
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional, Dict, Any, Iterable
+
+from backend.database import SessionLocal
+from backend import crud
+from backend.utils.doi_index import doi_index
+
+# 缓存有效期：找到的元数据 / CrossRef 返回 404 的DOI
+DOI_CACHE_TTL = timedelta(days=float(os.environ.get("DOI_CACHE_TTL_DAYS", 30)))
+DOI_NEGATIVE_TTL = timedelta(hours=float(os.environ.get("DOI_NEGATIVE_TTL_HOURS", 24)))
+
+_DOI_PREFIX = re.compile(r"^(?:https?://(?:dx\.)?doi\.org/|doi:\s*)", re.IGNORECASE)
+
+
+def normalize_doi(doi: str) -> str:
+    """规范化DOI：去掉 URL/doi: 前缀和空白，并转为小写（DOI 不区分大小写）"""
+    return _DOI_PREFIX.sub("", doi.strip()).strip().lower()
+
+
+# CrossRef 接口地址（测试/压测时可指向本地模拟服务）
+CROSSREF_API_URL = os.environ.get("CROSSREF_API_URL", "https://api.crossref.org/works/")
+CROSSREF_CONNECT_TIMEOUT = float(os.environ.get("CROSSREF_CONNECT_TIMEOUT", 5))
+CROSSREF_READ_TIMEOUT = float(os.environ.get("CROSSREF_READ_TIMEOUT", 15))
+CROSSREF_MAX_CONNECTIONS = int(os.environ.get("CROSSREF_MAX_CONNECTIONS", 10))
+
+# 仅使用离线索引（出网受限的部署）：索引中查不到的DOI直接视为不存在
+DOI_INDEX_ONLY = os.environ.get("DOI_INDEX_ONLY", "0") == "1"
+
+# CrossRef polite pool：User-Agent 中带联系邮箱，请求速率与并发保持在其建议范围内
+CROSSREF_MAILTO = os.environ.get("CROSSREF_MAILTO", "")
+CROSSREF_RATE_LIMIT = float(os.environ.get("CROSSREF_RATE_LIMIT", 10))
+CROSSREF_BATCH_CONCURRENCY = int(os.environ.get("CROSSREF_BATCH_CONCURRENCY", 3))
+
+# 429/5xx 和网络错误的重试：带抖动的指数退避，优先遵循 Retry-After
+CROSSREF_MAX_RETRIES = int(os.environ.get("CROSSREF_MAX_RETRIES", 2))
+CROSSREF_BACKOFF_BASE = float(os.environ.get("CROSSREF_BACKOFF_BASE", 0.5))
+CROSSREF_BACKOFF_MAX = float(os.environ.get("CROSSREF_BACKOFF_MAX", 8))
+# 单次查询（含重试）的总时长上限，超过后不再重试
+CROSSREF_TOTAL_TIMEOUT = float(os.environ.get("CROSSREF_TOTAL_TIMEOUT", 20))
+# 熔断：连续失败达到阈值后在冷却时间内直接失败，不再请求 CrossRef
+CROSSREF_BREAKER_THRESHOLD = int(os.environ.get("CROSSREF_BREAKER_THRESHOLD", 5))
+CROSSREF_BREAKER_COOLDOWN = float(os.environ.get("CROSSREF_BREAKER_COOLDOWN", 30))
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+try:
+    # HTTP/2 需要可选依赖 h2（httpx[http2]），未安装时退回 HTTP/1.1 keep-alive
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class DOILookup:
+    """DOI查询结果：found / not_found（CrossRef 确认不存在）/ error（暂时无法查询）"""
+
+    FOUND = "found"
+    NOT_FOUND = "not_found"
+    ERROR = "error"
+
+    __slots__ = ("status", "metadata")
+
+    def __init__(self, status: str, metadata: Optional[Dict[str, Any]] = None):
+        self.status = status
+        self.metadata = metadata
+
+    @property
+    def found(self) -> bool:
+        return self.status == self.FOUND
+
+
+class TokenBucket:
+    """
+    令牌桶限速：平均每秒 rate 个请求，允许 burst 个突发（rate <= 0 表示不限速）
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        # 排队取令牌，保证先到先得
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class CrossRefUnavailable(Exception):
+    """熔断器打开，CrossRef 暂时不可用"""
+
+
+class CircuitBreaker:
+    """
+    熔断器：closed（正常）→ 连续失败 threshold 次 → open（直接失败）
+    → 冷却 cooldown 秒后 half_open（只放行一个探测请求）→ 探测成功则 closed，失败则重新 open
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._probing = False
+        self._probe_started = 0.0
+
+    def allow(self) -> bool:
+        if self.threshold <= 0 or self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.cooldown:
+                return False
+            self.state = self.HALF_OPEN
+        # half_open：同一时间只放行一个探测请求（探测请求被取消时，超过冷却时间后允许新的探测）
+        if self._probing and time.monotonic() - self._probe_started < self.cooldown:
+            return False
+        self._probing = True
+        self._probe_started = time.monotonic()
+        return True
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        self._probing = False
+        if self.threshold > 0 and (
+            self.state == self.HALF_OPEN or self.consecutive_failures >= self.threshold
+        ):
+            if self.state != self.OPEN:
+                self.times_opened += 1
+                print(f"⚠️ CrossRef 连续失败 {self.consecutive_failures} 次，熔断 {self.cooldown:.0f} 秒")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def snapshot(self) -> Dict[str, Any]:
+        retry_in = 0.0
+        if self.state == self.OPEN:
+            retry_in = max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+            "retry_in_seconds": round(retry_in, 1),
+        }
+
+
+def _retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """解析 Retry-After（秒数或 HTTP 日期）"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return max(0.0, (moment - datetime.now(timezone.utc)).total_seconds())
+
+
+def _user_agent() -> str:
+    if CROSSREF_MAILTO:
+        return f"Conventional-SC-Dataset/1.0 (mailto:{CROSSREF_MAILTO})"
+    return "Conventional-SC-Dataset/1.0"
 
 
 class DOIResolver:
     """DOI解析器"""
 
-    def __init__(self):
-        self.crossref_api_url = "https://api.crossref.org/works/"
+    def __init__(self, api_url: str = CROSSREF_API_URL):
+        self.crossref_api_url = api_url if api_url.endswith("/") else api_url + "/"
         self.doi_org_url = "https://doi.org/"
-        self.timeout = 30.0
+        # 连接超时短、读取超时稍长：CrossRef 不可达时尽快失败
+        self.timeout = httpx.Timeout(
+            connect=CROSSREF_CONNECT_TIMEOUT,
+            read=CROSSREF_READ_TIMEOUT,
+            write=CROSSREF_CONNECT_TIMEOUT,
+            pool=CROSSREF_CONNECT_TIMEOUT
+        )
+        self.limits = httpx.Limits(
+            max_connections=CROSSREF_MAX_CONNECTIONS,
+            max_keepalive_connections=CROSSREF_MAX_CONNECTIONS,
+            keepalive_expiry=60.0
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+        # 正在进行的查询：规范化DOI -> Task
+        self._inflight: Dict[str, asyncio.Task] = {}
+        # 所有发往 CrossRef 的请求共用一个令牌桶（缓存命中不消耗令牌）
+        self.rate_limiter = TokenBucket(CROSSREF_RATE_LIMIT)
+        self.breaker = CircuitBreaker(CROSSREF_BREAKER_THRESHOLD, CROSSREF_BREAKER_COOLDOWN)
+        # 请求计数：调用次数 / 实际发出的请求 / 重试 / 失败的请求 / 被熔断拒绝的调用
+        self.counters = {"calls": 0, "attempts": 0, "retries": 0, "failures": 0, "short_circuited": 0}
+
+    def _create_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            timeout=self.timeout,
+            limits=self.limits,
+            headers={"User-Agent": _user_agent()},
+            follow_redirects=True
+        )
+
+    async def start(self) -> None:
+        """创建长连接客户端（FastAPI 启动时调用）"""
+        if self._client is None:
+            self._client = self._create_client()
+
+    async def close(self) -> None:
+        """关闭客户端并释放连接（FastAPI 关闭时调用）"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """共享的 HTTP 客户端；命令行脚本中未调用 start() 时按需创建"""
+        if self._client is None:
+            self._client = self._create_client()
+        return self._client
+
+    async def fetch_work(self, clean_doi: str) -> httpx.Response:
+        """
+        请求 CrossRef works 接口（复用连接、受令牌桶限速，不经过缓存）
 
-    async def resolve_doi(self, doi: str) -> Optional[Dict[str, Any]]:
+        429/5xx 和网络错误按带抖动的指数退避重试（Retry-After 优先）；熔断器打开时直接抛出
+        CrossRefUnavailable。重试用尽后返回最后一次响应，或抛出最后一次网络错误。
         """
-        解析DOI并获取文献元数据
+        self.counters["calls"] += 1
+        deadline = time.monotonic() + CROSSREF_TOTAL_TIMEOUT
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                self.counters["short_circuited"] += 1
+                raise CrossRefUnavailable("CrossRef 暂时不可用（熔断中）")
+
+            await self.rate_limiter.acquire()
+            self.counters["attempts"] += 1
+            response = None
+            try:
+                response = await self.client.get(f"{self.crossref_api_url}{clean_doi}")
+            except httpx.RequestError as e:
+                error = e
+            else:
+                if response.status_code not in RETRYABLE_STATUS:
+                    self.breaker.record_success()
+                    return response
+                error = None
+
+            self.counters["failures"] += 1
+            self.breaker.record_failure()
+
+            delay = _retry_after_seconds(response) if response is not None else None
+            if delay is None:
+                # full jitter：在 [0, base * 2^attempt] 内随机等待，避免同时重试
+                delay = random.uniform(0, min(CROSSREF_BACKOFF_MAX, CROSSREF_BACKOFF_BASE * 2 ** attempt))
+            # 重试用尽，或需要等待的时间过长（上传请求不应一直挂起）
+            if (attempt >= CROSSREF_MAX_RETRIES or delay > CROSSREF_BACKOFF_MAX
+                    or time.monotonic() + delay >= deadline):
+                if error is not None:
+                    raise error
+                return response
+
+            attempt += 1
+            self.counters["retries"] += 1
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        """请求计数与熔断器状态"""
+        return {**self.counters, "breaker": self.breaker.snapshot()}
+
+    async def lookup(self, doi: str) -> "DOILookup":
+        """
+        查询DOI：一次请求同时得到“是否存在”和元数据
+
+        先查缓存：未过期的命中直接返回（包括“DOI 不存在”的负缓存）；否则请求 CrossRef 并写回缓存。
+        同一DOI的并发查询合并为一次请求（single-flight），所有等待者共享结果。
 
         Args:
             doi: DOI标识符，如 "10.1038/nature12345"
-
-        Returns:
-            包含文献元数据的字典，如果解析失败返回None
         """
+        clean_doi = normalize_doi(doi)
+        if not clean_doi:
+            return DOILookup(DOILookup.NOT_FOUND)
+
+        task = self._inflight.get(clean_doi)
+        if task is None:
+            task = asyncio.ensure_future(self._lookup_once(clean_doi))
+            self._inflight[clean_doi] = task
+            task.add_done_callback(lambda _: self._inflight.pop(clean_doi, None))
+        # shield：某个等待者被取消（如客户端断开）时不影响其他等待者
+        return await asyncio.shield(task)
+
+    async def _lookup_once(self, clean_doi: str) -> "DOILookup":
+        # 离线索引与缓存表都是同步的 SQLite 读写，放到线程池执行，不阻塞事件循环
+        loop = asyncio.get_running_loop()
+        # 优先查本地离线索引（由 CrossRef 数据转储导入），命中时无需联网
+        indexed = await loop.run_in_executor(None, doi_index.get, clean_doi)
+        if indexed is not None:
+            return DOILookup(DOILookup.FOUND, indexed)
+        if DOI_INDEX_ONLY:
+            # 仅离线模式：索引中没有即视为不存在，不访问 CrossRef
+            return DOILookup(DOILookup.NOT_FOUND)
+
+        cached = await loop.run_in_executor(None, self._cache_get, clean_doi)
+        if cached and cached.expires_at > datetime.utcnow():
+            if cached.found:
+                return DOILookup(DOILookup.FOUND, json.loads(cached.metadata_json))
+            return DOILookup(DOILookup.NOT_FOUND)
+
         try:
-            # 清理DOI（移除可能的URL前缀）
-            clean_doi = doi.replace("https://doi.org/", "").replace("http://doi.org/", "").strip()
+            # 调用CrossRef API（共享客户端，复用 TCP/TLS 连接）
+            response = await self.fetch_work(clean_doi)
 
-            # 调用CrossRef API
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.get(f"{self.crossref_api_url}{clean_doi}")
+            if response.status_code == 404:
+                await loop.run_in_executor(None, self._cache_put, clean_doi, None, None, DOI_NEGATIVE_TTL)
+                return DOILookup(DOILookup.NOT_FOUND)
 
-                if response.status_code != 200:
-                    return None
+            if response.status_code != 200:
+                raise httpx.HTTPStatusError(
+                    f"CrossRef 返回 {response.status_code}", request=response.request, response=response
+                )
 
-                data = response.json()
+            data = response.json()
 
-                if "message" not in data:
-                    return None
+            if "message" not in data:
+                raise ValueError("CrossRef 响应缺少 message 字段")
 
-                # 提取元数据
-                message = data["message"]
-                metadata = self._extract_metadata(message)
-                return metadata
+            # 提取元数据
+            message = data["message"]
+            metadata = self._extract_metadata(message)
+            await loop.run_in_executor(None, self._cache_put, clean_doi, metadata, message, DOI_CACHE_TTL)
+            return DOILookup(DOILookup.FOUND, metadata)
 
         except Exception as e:
             print(f"DOI解析错误: {e}")
+            # 网络或服务异常时，过期的正缓存仍比没有好
+            if cached and cached.found:
+                return DOILookup(DOILookup.FOUND, json.loads(cached.metadata_json))
+            return DOILookup(DOILookup.ERROR)
+
+    async def lookup_many(
+        self, dois: Iterable[str], concurrency: int = CROSSREF_BATCH_CONCURRENCY
+    ) -> Dict[str, "DOILookup"]:
+        """
+        并发查询一批DOI（批量上传使用）
+
+        同时进行的请求数由信号量限制，请求速率由令牌桶限制；重复的DOI只查询一次
+
+        Returns:
+            规范化DOI -> DOILookup
+        """
+        unique = list(dict.fromkeys(normalize_doi(doi) for doi in dois if doi))
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def one(clean_doi: str) -> "DOILookup":
+            async with semaphore:
+                return await self.lookup(clean_doi)
+
+        results = await asyncio.gather(*[one(doi) for doi in unique])
+        return dict(zip(unique, results))
+
+    async def resolve_doi(self, doi: str) -> Optional[Dict[str, Any]]:
+        """
+        解析DOI并获取文献元数据
+
+        Args:
+            doi: DOI标识符，如 "10.1038/nature12345"
+
+        Returns:
+            包含文献元数据的字典，如果解析失败返回None
+        """
+        return (await self.lookup(doi)).metadata
+
+    def _cache_get(self, doi: str):
+        db = SessionLocal()
+        try:
+            entry = crud.get_cached_doi(db, doi)
+            if entry:
+                db.expunge(entry)
+            return entry
+        except Exception as e:
+            print(f"DOI缓存读取失败: {e}")
             return None
+        finally:
+            db.close()
+
+    def _cache_put(self, doi: str, metadata: Optional[Dict[str, Any]], raw, ttl: timedelta) -> None:
+        db = SessionLocal()
+        try:
+            crud.save_doi_metadata(db, doi, metadata, raw, ttl)
+        except Exception as e:
+            print(f"DOI缓存写入失败: {e}")
+        finally:
+            db.close()
 
-    def _extract_metadata(self, message: Dict[str, Any]) -> Dict[str, Any]:
+    @staticmethod
+    def _extract_metadata(message: Dict[str, Any]) -> Dict[str, Any]:
         """
         从CrossRef响应中提取元数据
 
@@ -119,21 +498,51 @@ class DOIResolver:
         """
         验证DOI是否有效（是否存在）
 
+        需要同时使用元数据时请直接调用 lookup()，避免重复查询
+
         Args:
             doi: DOI标识符
 
         Returns:
             True表示DOI有效，False表示无效
         """
-        metadata = await self.resolve_doi(doi)
-        return metadata is not None
+        return (await self.lookup(doi)).found
 
 
+# 从 CrossRef message 提取元数据（离线索引导入也使用同一逻辑）
+extract_metadata = DOIResolver._extract_metadata
+
 # 创建全局实例
 doi_resolver = DOIResolver()
 
 
 # 便捷函数
+async def lookup_doi(doi: str) -> DOILookup:
+    """
+    查询DOI的便捷函数（一次请求同时完成验证和元数据获取）
+
+    Args:
+        doi: DOI标识符
+
+    Returns:
+        DOILookup，status 为 found / not_found / error
+    """
+    return await doi_resolver.lookup(doi)
+
+
+async def lookup_dois(dois: Iterable[str]) -> Dict[str, DOILookup]:
+    """
+    并发、限速地查询一批DOI
+
+    Args:
+        dois: DOI列表（可重复）
+
+    Returns:
+        规范化DOI -> DOILookup
+    """
+    return await doi_resolver.lookup_many(dois)
+
+
 async def get_doi_metadata(doi: str) -> Optional[Dict[str, Any]]:
     """
     获取DOI元数据的便捷函数
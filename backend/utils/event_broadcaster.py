@@ -0,0 +1,103 @@
+"""
+进程内事件广播器
+将文献审核、上传、删除等事件通过 asyncio 队列分发给所有 SSE 订阅者
+"""
+import asyncio
+import json
+from typing import Any, Dict, Optional, Set
+
+
+class EventBroadcaster:
+    """事件广播器（仅在事件循环线程内调用）"""
+
+    def __init__(self, queue_size: int = 100):
+        """
+        初始化广播器
+
+        Args:
+            queue_size: 每个订阅者的事件缓冲上限，慢订阅者超出后丢弃最旧的事件
+        """
+        self.queue_size = queue_size
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._last_event_id = 0
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> asyncio.Queue:
+        """注册订阅者，返回其事件队列"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        """注销订阅者"""
+        self._subscribers.discard(queue)
+
+    def publish(self, event_type: str, data: Dict[str, Any], admin_only: bool = False) -> Dict[str, Any]:
+        """
+        发布事件（非阻塞）
+
+        Args:
+            event_type: 事件类型，如 "paper.reviewed"
+            data: 事件内容（可JSON序列化）
+            admin_only: 是否仅推送给管理员订阅者
+
+        Returns:
+            发布的事件
+        """
+        self._last_event_id += 1
+        event = {
+            "id": self._last_event_id,
+            "type": event_type,
+            "data": data,
+            "admin_only": admin_only
+        }
+
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # 订阅者消费过慢：丢弃最旧事件，保证发布方永不阻塞
+                try:
+                    queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    pass
+                queue.put_nowait(event)
+
+        return event
+
+
+def format_sse(event: Optional[Dict[str, Any]] = None, comment: Optional[str] = None) -> str:
+    """
+    按 text/event-stream 格式序列化事件
+
+    Args:
+        event: 广播器发布的事件
+        comment: 注释行（用于心跳保活）
+    """
+    if event is None:
+        return f": {comment or ''}\n\n"
+    payload = json.dumps(event["data"], ensure_ascii=False)
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {payload}\n\n"
+
+
+# 创建全局实例
+event_broadcaster = EventBroadcaster()
+
+
+# 便捷函数
+def publish_event(event_type: str, data: Dict[str, Any], admin_only: bool = False) -> Dict[str, Any]:
+    """
+    发布事件的便捷函数
+
+    Args:
+        event_type: 事件类型
+        data: 事件内容
+        admin_only: 是否仅推送给管理员
+
+    Returns:
+        发布的事件
+    """
+    return event_broadcaster.publish(event_type, data, admin_only)
@@ -0,0 +1,98 @@
+"""
+HTTP 缓存工具
+为按内容哈希标识的资源生成强 ETag / Cache-Control，并判断条件请求
+"""
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Mapping, Optional
+
+# URL 中带有内容版本（?v=哈希）时，内容永不变化，可长期缓存
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# URL 不带版本时，允许缓存但每次使用前需用 ETag 重新验证（命中返回 304）
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+
+# ?v= 版本参数的最短长度（哈希前缀）
+MIN_VERSION_LENGTH = 8
+
+
+def make_etag(digest: str) -> str:
+    """由内容哈希生成强 ETag"""
+    return f'"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """判断 If-None-Match 是否命中（按 RFC 9110 使用弱比较）"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def _as_utc(moment: datetime) -> datetime:
+    # SQLite 返回的时间不带时区，库中统一保存 UTC
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc)
+
+
+def http_date(moment: datetime) -> str:
+    """格式化为 HTTP 日期（RFC 7231）"""
+    return format_datetime(_as_utc(moment), usegmt=True)
+
+
+def version_matches(version: Optional[str], digest: str) -> bool:
+    """?v= 参数是否与当前内容哈希一致"""
+    return bool(version) and len(version) >= MIN_VERSION_LENGTH and digest.startswith(version)
+
+
+def cache_headers(
+    digest: str,
+    last_modified: Optional[datetime] = None,
+    immutable: bool = False
+) -> Dict[str, str]:
+    """
+    生成缓存相关响应头
+
+    Args:
+        digest: 内容哈希
+        last_modified: 内容创建/修改时间
+        immutable: 是否为带版本的不可变 URL
+    """
+    headers = {
+        "ETag": make_etag(digest),
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL,
+    }
+    if last_modified:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+def is_not_modified(
+    request_headers: Mapping[str, str],
+    digest: str,
+    last_modified: Optional[datetime] = None
+) -> bool:
+    """
+    判断条件请求是否可以直接返回 304
+
+    If-None-Match 存在时优先使用（忽略 If-Modified-Since）
+    """
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, make_etag(digest))
+
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return _as_utc(last_modified).replace(microsecond=0) <= _as_utc(since)
+    return False
@@ -0,0 +1,159 @@
+"""
+HTTP Range 请求工具
+支持单段与多段（multipart/byteranges）字节范围，只读取请求的字节窗口
+"""
+import secrets
+from typing import Callable, Dict, List, Mapping, Optional, Tuple
+
+from fastapi import Response
+
+from backend.utils.http_cache import etag_matches
+
+# 单个请求允许的最大范围段数，防止构造大量小范围放大开销
+MAX_RANGES = 16
+
+ByteRange = Tuple[int, int]  # (起始偏移, 结束偏移)，闭区间
+
+
+class RangeNotSatisfiable(Exception):
+    """请求的范围全部超出内容长度"""
+
+
+def parse_range_header(header: Optional[str], size: int) -> Optional[List[ByteRange]]:
+    """
+    解析 Range 请求头
+
+    Args:
+        header: Range 头，如 "bytes=0-1023,-500"
+        size: 内容总长度
+
+    Returns:
+        合并排序后的范围列表；请求头缺失或格式无法识别时返回None（按完整内容响应）
+
+    Raises:
+        RangeNotSatisfiable: 所有范围都无法满足
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec.strip():
+        return None
+
+    specs = [part.strip() for part in spec.split(",") if part.strip()]
+    if not specs or len(specs) > MAX_RANGES:
+        return None
+
+    ranges: List[ByteRange] = []
+    for part in specs:
+        first, sep, last = part.partition("-")
+        if not sep:
+            return None
+        try:
+            if first == "":
+                # 后缀范围：最后 N 个字节
+                suffix = int(last)
+                if suffix <= 0:
+                    continue
+                start, end = max(size - suffix, 0), size - 1
+            else:
+                start = int(first)
+                end = int(last) if last else None
+                if start < 0 or (end is not None and end < start):
+                    return None
+                if start >= size:
+                    # 起点超出内容长度（含 "bytes=N-" 开放范围）：该段无法满足
+                    continue
+                end = size - 1 if end is None else min(end, size - 1)
+        except ValueError:
+            return None
+        if start < size:
+            ranges.append((start, end))
+
+    if not ranges:
+        raise RangeNotSatisfiable()
+
+    # 合并重叠或相邻的范围
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end + 1:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def range_response(
+    request_headers: Mapping[str, str],
+    size: int,
+    read: Callable[[int, int], bytes],
+    media_type: str,
+    headers: Dict[str, str]
+) -> Optional[Response]:
+    """
+    根据 Range/If-Range 请求头构造 206/416 响应
+
+    Args:
+        request_headers: 请求头
+        size: 内容总长度
+        read: 读取函数 read(start, length)，只读取所需字节
+        media_type: 内容类型
+        headers: 需要附带的缓存等响应头（含 ETag）
+
+    Returns:
+        部分内容响应；不是范围请求（或 If-Range 不匹配）时返回None，由调用方返回完整内容
+    """
+    range_header = request_headers.get("range")
+    if not range_header:
+        return None
+
+    # If-Range 与当前 ETag 不一致时，说明客户端缓存的是旧内容，返回完整内容
+    if_range = request_headers.get("if-range")
+    if if_range and not (headers.get("ETag") and etag_matches(if_range, headers["ETag"])):
+        return None
+
+    try:
+        ranges = parse_range_header(range_header, size)
+    except RangeNotSatisfiable:
+        return Response(
+            status_code=416,
+            headers={**headers, "Content-Range": f"bytes */{size}"}
+        )
+    if ranges is None:
+        return None
+
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        return Response(
+            content=read(start, end - start + 1),
+            status_code=206,
+            media_type=media_type,
+            headers={**headers, "Content-Range": f"bytes {start}-{end}/{size}"}
+        )
+
+    boundary = secrets.token_hex(16)
+    parts = []
+    for start, end in ranges:
+        parts.append(
+            f"--{boundary}\r\n"
+            f"Content-Type: {media_type}\r\n"
+            f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n".encode()
+        )
+        parts.append(read(start, end - start + 1))
+        parts.append(b"\r\n")
+    parts.append(f"--{boundary}--\r\n".encode())
+
+    return Response(
+        content=b"".join(parts),
+        status_code=206,
+        media_type=f"multipart/byteranges; boundary={boundary}",
+        headers=headers
+    )
+
+
+def read_file_range(path, start: int, length: int) -> bytes:
+    """从文件中读取指定字节窗口"""
+    with open(path, "rb") as f:
+        f.seek(start)
+        return f.read(length)
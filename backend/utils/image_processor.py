@@ -4,7 +4,25 @@
 """
 from PIL import Image
 from io import BytesIO
-from typing import Tuple
+from typing import Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import asyncio
+import hashlib
+import multiprocessing
+import os
+
+
+# 生成算法本身变化（而非参数变化）时递增，使旧截图全部重新生成
+RENDITION_ALGORITHM_VERSION = 1
+
+# dHash 边长（8 -> 64位）
+DHASH_SIZE = 8
+
+
+def hamming_distance(hash_a: str, hash_b: str) -> int:
+    """两个十六进制感知哈希之间不同的位数"""
+    return bin(int(hash_a, 16) ^ int(hash_b, 16)).count("1")
 
 
 class ImageProcessor:
@@ -14,7 +32,8 @@ class ImageProcessor:
         self,
         thumbnail_size: Tuple[int, int] = (200, 200),
         max_image_size: Tuple[int, int] = (1920, 1920),
-        jpeg_quality: int = 85
+        jpeg_quality: int = 85,
+        thumbnail_quality: int = 75
     ):
         """
         初始化图片处理器
@@ -23,10 +42,46 @@ class ImageProcessor:
             thumbnail_size: 缩略图尺寸（宽, 高），默认200x200
             max_image_size: 原图最大尺寸（宽, 高），默认1920x1920
             jpeg_quality: JPEG压缩质量（1-100），默认85
+            thumbnail_quality: 缩略图JPEG质量（1-100），默认75
         """
         self.thumbnail_size = thumbnail_size
         self.max_image_size = max_image_size
         self.jpeg_quality = jpeg_quality
+        self.thumbnail_quality = thumbnail_quality
+
+    @property
+    def rendition_version(self) -> str:
+        """
+        当前生成参数的指纹，随截图一起保存
+
+        参数调整后指纹变化，regenerate_thumbnails 据此找出需要重新生成的旧记录
+        """
+        settings = (
+            f"v{RENDITION_ALGORITHM_VERSION}|thumb={self.thumbnail_size}|max={self.max_image_size}"
+            f"|q={self.jpeg_quality}|tq={self.thumbnail_quality}"
+        )
+        return hashlib.sha256(settings.encode()).hexdigest()[:16]
+
+    def regenerate(self, image_data: bytes) -> Tuple[Optional[bytes], bytes]:
+        """
+        按当前参数重新生成已保存截图的派生图
+
+        已保存的原图本身是有损压缩结果，只有超过当前最大尺寸时才重新压缩，否则保持不变以免画质继续下降
+
+        Returns:
+            (新的原图字节或None表示不变, 新的缩略图字节)
+        """
+        try:
+            image = Image.open(BytesIO(image_data))
+            oversized = image.width > self.max_image_size[0] or image.height > self.max_image_size[1]
+            # 只需要缩略图时，按缩略图尺寸缩小解码
+            self._draft_for_target(image, self.max_image_size if oversized else self.thumbnail_size)
+            if image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            compressed = self._compress_image(image) if oversized else None
+            return compressed, self._generate_thumbnail(image)
+        except Exception as e:
+            raise ValueError(f"图片重新生成失败: {str(e)}")
 
     def process_image(self, image_data: bytes) -> Tuple[bytes, bytes]:
         """
@@ -42,9 +97,12 @@ class ImageProcessor:
             ValueError: 如果图片无法打开或处理
         """
         try:
-            # 打开图片
+            # 打开图片（此时只读取文件头，尚未解码）
             image = Image.open(BytesIO(image_data))
 
+            # JPEG 按目标尺寸以 1/2、1/4、1/8 比例直接缩小解码，避免完整解码大图
+            self._draft_for_target(image, self.max_image_size)
+
             # 转换为RGB模式（如果是RGBA或其他模式）
             if image.mode not in ('RGB', 'L'):
                 image = image.convert('RGB')
@@ -60,6 +118,51 @@ class ImageProcessor:
         except Exception as e:
             raise ValueError(f"图片处理失败: {str(e)}")
 
+    def process_image_with_hash(self, image_data: bytes) -> Tuple[bytes, bytes, str]:
+        """
+        处理图片并计算感知哈希（用于上传时识别重复截图）
+
+        Returns:
+            (压缩后的原图字节, 缩略图字节, 感知哈希)
+        """
+        compressed, thumbnail = self.process_image(image_data)
+        # 对压缩后的原图计算，与库中已有记录的计算口径一致
+        return compressed, thumbnail, self.perceptual_hash(compressed)
+
+    def perceptual_hash(self, image_data: bytes) -> str:
+        """
+        计算差值哈希（dHash，64位，16位十六进制）
+
+        缩放到 9x8 灰度后比较相邻像素明暗，重新压缩、轻微缩放后的同一张图哈希相同或只差几位
+        """
+        try:
+            image = Image.open(BytesIO(image_data))
+            image.draft("L", (DHASH_SIZE * 4, DHASH_SIZE * 4))
+            pixels = list(
+                image.convert("L").resize((DHASH_SIZE + 1, DHASH_SIZE), Image.Resampling.LANCZOS).getdata()
+            )
+        except Exception as e:
+            raise ValueError(f"感知哈希计算失败: {str(e)}")
+
+        value = 0
+        for row in range(DHASH_SIZE):
+            offset = row * (DHASH_SIZE + 1)
+            for col in range(DHASH_SIZE):
+                value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+        return f"{value:016x}"
+
+    def _draft_for_target(self, image: Image.Image, target: Tuple[int, int]) -> None:
+        """
+        为 JPEG 设置缩小解码（draft 模式）
+
+        draft 只会选择不小于目标尺寸的缩放比例，因此后续压缩和缩略图的画质不受影响
+        """
+        if image.format != "JPEG":
+            return
+        ratio = min(target[0] / image.width, target[1] / image.height)
+        if ratio < 1:
+            image.draft("RGB", (max(1, int(image.width * ratio)), max(1, int(image.height * ratio))))
+
     def _compress_image(self, image: Image.Image) -> bytes:
         """
         压缩图片
@@ -97,7 +200,7 @@ class ImageProcessor:
 
         # 保存为JPEG格式
         output = BytesIO()
-        thumb.save(output, format='JPEG', quality=75, optimize=True)
+        thumb.save(output, format='JPEG', quality=self.thumbnail_quality, optimize=True)
         return output.getvalue()
 
     def validate_image(self, image_data: bytes) -> bool:
@@ -142,7 +245,17 @@ class ImageProcessor:
 
 
 # 创建全局实例
-image_processor = ImageProcessor()
+def _size_from_env(name: str, default: int) -> Tuple[int, int]:
+    size = int(os.environ.get(name, default))
+    return (size, size)
+
+
+image_processor = ImageProcessor(
+    thumbnail_size=_size_from_env("THUMBNAIL_SIZE", 200),
+    max_image_size=_size_from_env("IMAGE_MAX_SIZE", 1920),
+    jpeg_quality=int(os.environ.get("JPEG_QUALITY", 85)),
+    thumbnail_quality=int(os.environ.get("THUMBNAIL_QUALITY", 75))
+)
 
 
 # 便捷函数
@@ -159,6 +272,19 @@ def process_image(image_data: bytes) -> Tuple[bytes, bytes]:
     return image_processor.process_image(image_data)
 
 
+def perceptual_hash(image_data: bytes) -> str:
+    """
+    计算感知哈希的便捷函数
+
+    Args:
+        image_data: 图片字节数据
+
+    Returns:
+        16位十六进制 dHash
+    """
+    return image_processor.perceptual_hash(image_data)
+
+
 def validate_image(image_data: bytes) -> bool:
     """
     验证图片的便捷函数
@@ -183,3 +309,121 @@ def get_image_info(image_data: bytes) -> dict:
         图片信息字典
     """
     return image_processor.get_image_info(image_data)
+
+
+# ============= 进程池（将 CPU 密集的图片处理移出事件循环） =============
+
+# 工作进程数
+IMAGE_WORKERS = int(os.environ.get("IMAGE_WORKERS", max(1, min(4, os.cpu_count() or 1))))
+# 同时排队/处理的图片上限（背压），超出后新请求等待 IMAGE_QUEUE_TIMEOUT 秒
+IMAGE_MAX_PENDING = int(os.environ.get("IMAGE_MAX_PENDING", IMAGE_WORKERS * 4))
+IMAGE_QUEUE_TIMEOUT = float(os.environ.get("IMAGE_QUEUE_TIMEOUT", 5))
+# 单张图片处理超时（秒）
+IMAGE_TASK_TIMEOUT = float(os.environ.get("IMAGE_TASK_TIMEOUT", 30))
+
+
+class ImageProcessingBusy(Exception):
+    """图片处理队列已满"""
+
+
+class ImageProcessingTimeout(Exception):
+    """单张图片处理超时"""
+
+
+class ImageProcessingCrashed(Exception):
+    """图片处理工作进程异常退出（服务端故障，与图片本身无关）"""
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+_slots: Optional[asyncio.Semaphore] = None
+
+
+def _validate_and_process(image_data: bytes) -> Tuple[bytes, bytes, str]:
+    """在工作进程中执行：验证并处理图片，同时计算感知哈希"""
+    if not image_processor.validate_image(image_data):
+        raise ValueError("图片无效或损坏")
+    return image_processor.process_image_with_hash(image_data)
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """获取（必要时创建）图片处理进程池"""
+    global _executor
+    if _executor is None:
+        # 使用 spawn 启动，避免在多线程的服务进程中 fork
+        _executor = ProcessPoolExecutor(
+            max_workers=IMAGE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+
+def _discard_broken_executor(pool: ProcessPoolExecutor) -> None:
+    """关闭已损坏的进程池并丢弃，下次提交时重建（其他请求可能已经替换过）"""
+    global _executor
+    pool.shutdown(wait=False, cancel_futures=True)
+    if _executor is pool:
+        _executor = None
+
+
+def shutdown_executor() -> None:
+    """关闭图片处理进程池"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def run_in_image_pool(func, *args):
+    """
+    在进程池中执行图片任务，带背压与超时
+
+    Raises:
+        ImageProcessingBusy: 排队超过 IMAGE_QUEUE_TIMEOUT 秒
+        ImageProcessingTimeout: 处理超过 IMAGE_TASK_TIMEOUT 秒
+        ImageProcessingCrashed: 工作进程异常退出
+    """
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(IMAGE_MAX_PENDING)
+    slots = _slots
+
+    try:
+        await asyncio.wait_for(slots.acquire(), timeout=IMAGE_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise ImageProcessingBusy("图片处理繁忙，请稍后重试")
+
+    loop = asyncio.get_running_loop()
+    pool = get_executor()
+    try:
+        future = loop.run_in_executor(pool, func, *args)
+    except BrokenProcessPool:
+        slots.release()
+        _discard_broken_executor(pool)
+        raise ImageProcessingCrashed("图片处理进程异常退出，请稍后重试")
+    except Exception:
+        slots.release()
+        raise
+
+    # 名额在工作进程真正结束后才释放，超时的任务仍计入背压
+    future.add_done_callback(lambda _: slots.release())
+    try:
+        return await asyncio.wait_for(asyncio.shield(future), timeout=IMAGE_TASK_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise ImageProcessingTimeout("图片处理超时，请压缩图片后重试")
+    except BrokenProcessPool:
+        # 工作进程异常退出（如内存不足），关闭损坏的进程池，下次提交时重建
+        _discard_broken_executor(pool)
+        raise ImageProcessingCrashed("图片处理进程异常退出，请稍后重试")
+
+
+async def process_image_async(image_data: bytes) -> Tuple[bytes, bytes, str]:
+    """
+    在进程池中验证并处理图片的便捷函数
+
+    Args:
+        image_data: 原始图片字节数据
+
+    Returns:
+        (压缩后的原图, 缩略图, 感知哈希)
+    """
+    return await run_in_image_pool(_validate_and_process, image_data)
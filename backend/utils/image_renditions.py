@@ -0,0 +1,298 @@
+"""
+截图的现代格式副本（WebP / AVIF）
+- 副本由已保存的 JPEG 转码得到，按源图内容哈希保存在 <IMAGE_STORE_DIR>/renditions/ab/cd/<hash>.<格式>
+- 图片接口根据请求的 Accept 头选择格式；副本尚未生成时先返回 JPEG，并在响应后于进程池中补生成
+- 转码结果不比 JPEG 小时写入空文件作为标记，之后直接返回 JPEG，不再重复转码
+- 按宽度缩放的副本（?width=）保存在 <IMAGE_STORE_DIR>/resized，总大小受限，按 LRU 淘汰
+"""
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from PIL import Image, features
+
+from backend.utils.image_storage import IMAGE_STORE_DIR
+
+try:
+    # AVIF 需要可选插件 pillow-avif-plugin（Pillow 10 自身不支持 AVIF 编码）
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pass
+
+# 按优先级排列的副本格式
+RENDITION_FORMATS = [
+    fmt.strip().lower()
+    for fmt in os.environ.get("IMAGE_RENDITION_FORMATS", "avif,webp").split(",")
+    if fmt.strip()
+]
+RENDITION_DIR = os.path.join(IMAGE_STORE_DIR, "renditions")
+
+MEDIA_TYPES = {
+    "jpeg": "image/jpeg",
+    "webp": "image/webp",
+    "avif": "image/avif",
+}
+
+# 各格式的编码参数（截图以线条、文字为主，WebP/AVIF 在同等观感下明显小于 JPEG）
+ENCODE_OPTIONS = {
+    "webp": {"format": "WEBP", "quality": 80, "method": 4},
+    "avif": {"format": "AVIF", "quality": 60, "speed": 6},
+}
+
+
+def _can_encode(fmt: str) -> bool:
+    if fmt == "webp":
+        return bool(features.check("webp"))
+    if fmt == "avif":
+        return "AVIF" in Image.SAVE
+    return False
+
+
+def available_formats() -> List[str]:
+    """当前环境可以生成的副本格式（按优先级）"""
+    return [fmt for fmt in RENDITION_FORMATS if fmt in ENCODE_OPTIONS and _can_encode(fmt)]
+
+
+SUPPORTED_FORMATS = available_formats()
+
+
+def _parse_accept(accept: str) -> List[Tuple[str, float]]:
+    """解析 Accept 头为 (媒体类型, q值) 列表"""
+    items = []
+    for part in accept.split(","):
+        media_type, *params = [p.strip() for p in part.split(";")]
+        if not media_type:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        items.append((media_type.lower(), quality))
+    return items
+
+
+def negotiate_format(accept: Optional[str]) -> Optional[str]:
+    """
+    根据 Accept 头选择副本格式
+
+    只认可显式列出的 image/webp、image/avif（通配符 image/* 不代表客户端能解码新格式）
+
+    Returns:
+        格式名（如 "webp"）；客户端不支持任何副本格式时返回None（使用 JPEG）
+    """
+    if not accept or not SUPPORTED_FORMATS:
+        return None
+    accepted = {media_type: quality for media_type, quality in _parse_accept(accept)}
+    for fmt in SUPPORTED_FORMATS:
+        if accepted.get(MEDIA_TYPES[fmt], 0) > 0:
+            return fmt
+    return None
+
+
+def detect_format(data: bytes) -> str:
+    """按文件头判断图片格式（MEDIA_TYPES 的键），无法识别时按 JPEG 处理"""
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    if data[4:8] == b"ftyp" and data[8:12] in (b"avif", b"avis"):
+        return "avif"
+    return "jpeg"
+
+
+def encode_rendition(jpeg_data: bytes, fmt: str) -> bytes:
+    """
+    将 JPEG 转码为指定格式（可在工作进程中执行）
+
+    Returns:
+        转码后的字节；结果不比原图小时返回空字节
+    """
+    image = Image.open(BytesIO(jpeg_data))
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    output = BytesIO()
+    image.save(output, **ENCODE_OPTIONS[fmt])
+    data = output.getvalue()
+    return data if len(data) < len(jpeg_data) else b""
+
+
+class RenditionStore:
+    """副本文件仓库：<root>/ab/cd/<源图哈希>.<格式>"""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def path_for(self, digest: str, fmt: str) -> Path:
+        return self.root / digest[:2] / digest[2:4] / f"{digest}.{fmt}"
+
+    def exists(self, digest: str, fmt: str) -> bool:
+        """副本（或“不划算”标记）是否已生成"""
+        return self.path_for(digest, fmt).is_file()
+
+    def locate(self, digest: str, fmt: str) -> Optional[Path]:
+        """返回可用的副本文件路径；未生成或不比 JPEG 小时返回None"""
+        path = self.path_for(digest, fmt)
+        try:
+            return path if path.stat().st_size > 0 else None
+        except FileNotFoundError:
+            return None
+
+    def put(self, digest: str, fmt: str, data: bytes) -> Path:
+        """原子写入副本（data 为空表示只记录标记）"""
+        path = self.path_for(digest, fmt)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return path
+
+    def iter_files(self) -> Iterator[Tuple[str, Path]]:
+        """遍历全部副本文件，返回 (源图哈希, 路径)"""
+        if not self.root.exists():
+            return
+        for path in self.root.glob("??/??/*.*"):
+            if path.is_file() and not path.name.startswith(".tmp-"):
+                yield path.name.split(".", 1)[0], path
+
+
+# 创建全局实例
+rendition_store = RenditionStore(RENDITION_DIR)
+
+
+# ============= 按宽度缩放的副本（LRU 磁盘缓存） =============
+
+# 允许的输出宽度：请求宽度向上取整到其中之一，避免任意宽度撑爆缓存
+RESIZE_WIDTHS = sorted(
+    int(w) for w in os.environ.get("IMAGE_RESIZE_WIDTHS", "320,640,960,1280").split(",") if w.strip()
+)
+RESIZE_CACHE_DIR = os.path.join(IMAGE_STORE_DIR, "resized")
+RESIZE_CACHE_MAX_BYTES = int(os.environ.get("IMAGE_RESIZE_CACHE_MB", 256)) * 1024 * 1024
+
+RESIZE_ENCODE_OPTIONS = {
+    "jpeg": {"format": "JPEG", "quality": 82, "optimize": True},
+    **ENCODE_OPTIONS,
+}
+
+
+def snap_width(width: int) -> int:
+    """将请求宽度取整到允许的宽度（不小于请求值的最小档位，超过最大档位时取最大档）"""
+    for allowed in RESIZE_WIDTHS:
+        if width <= allowed:
+            return allowed
+    return RESIZE_WIDTHS[-1]
+
+
+def encode_resized(jpeg_data: bytes, width: int, fmt: str) -> bytes:
+    """
+    将原图缩放到指定宽度并编码（可在工作进程中执行）
+
+    Returns:
+        编码后的字节；原图不比目标宽度大时返回空字节（直接使用原图）
+    """
+    image = Image.open(BytesIO(jpeg_data))
+    if image.width <= width:
+        return b""
+    # JPEG 解码时直接按比例缩小，减少全尺寸解码的开销
+    image.draft("RGB", (width, image.height * width // image.width))
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    height = max(1, round(image.height * width / image.width))
+    image = image.resize((width, height), Image.Resampling.LANCZOS)
+    output = BytesIO()
+    image.save(output, **RESIZE_ENCODE_OPTIONS[fmt])
+    return output.getvalue()
+
+
+class ResizeCache:
+    """
+    缩放副本的磁盘缓存，键为 (源图哈希, 宽度, 格式)，总大小超过上限时淘汰最久未使用的文件
+
+    最近使用顺序保存在内存中，启动时按文件修改时间恢复（命中时会更新修改时间）
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Path, int]" = OrderedDict()
+        self._total = 0
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def path_for(self, digest: str, width: int, fmt: str) -> Path:
+        return self.root / digest[:2] / f"{digest}.w{width}.{fmt}"
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.root.exists():
+            return
+        files = []
+        for path in self.root.glob("??/*"):
+            if path.is_file() and not path.name.startswith(".tmp-"):
+                stat = path.stat()
+                files.append((stat.st_mtime, path, stat.st_size))
+        for _, path, size in sorted(files):
+            self._entries[path] = size
+            self._total += size
+
+    def get(self, digest: str, width: int, fmt: str) -> Optional[Path]:
+        """查找缓存（空文件表示原图已足够小）；未命中返回None"""
+        path = self.path_for(digest, width, fmt)
+        with self._lock:
+            self._load()
+            if path not in self._entries:
+                return None
+            if not path.is_file():
+                self._total -= self._entries.pop(path)
+                return None
+            self._entries.move_to_end(path)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    def put(self, digest: str, width: int, fmt: str, data: bytes) -> Path:
+        """写入缓存并按需淘汰最久未使用的文件"""
+        path = self.path_for(digest, width, fmt)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+        with self._lock:
+            self._load()
+            self._total -= self._entries.pop(path, 0)
+            self._entries[path] = len(data)
+            self._total += len(data)
+            while self._total > self.max_bytes and len(self._entries) > 1:
+                victim, size = self._entries.popitem(last=False)
+                self._total -= size
+                try:
+                    victim.unlink()
+                except FileNotFoundError:
+                    pass
+        return path
+
+
+# 创建全局实例
+resize_cache = ResizeCache(RESIZE_CACHE_DIR, RESIZE_CACHE_MAX_BYTES)
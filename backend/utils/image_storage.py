@@ -0,0 +1,198 @@
+"""
+文献截图存储后端
+- database: 图片二进制保存在 paper_images 表的 BLOB 列（旧方式）
+- filesystem: 按内容哈希保存为磁盘文件，paper_images 只保存哈希和元数据
+
+通过环境变量 IMAGE_STORAGE 选择后端（默认 database）；
+读取时两种后端都会优先查找内容仓库中的文件，因此迁移过程中新旧数据可以混存。
+"""
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import Iterator, Optional
+
+from backend.database import DATABASE_PATH
+
+IMAGE_STORAGE = os.environ.get("IMAGE_STORAGE", "database")
+IMAGE_STORE_DIR = os.environ.get("IMAGE_STORE_DIR") or os.path.join(
+    os.path.dirname(DATABASE_PATH), "image_store"
+)
+
+
+def content_hash(data: bytes) -> str:
+    """计算内容哈希（SHA-256 十六进制）"""
+    return hashlib.sha256(data).hexdigest()
+
+
+class ContentAddressedStore:
+    """按内容哈希组织的文件仓库：<root>/ab/cd/<hash>"""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def path_for(self, digest: str) -> Path:
+        """哈希对应的文件路径（不保证存在）"""
+        return self.root / digest[:2] / digest[2:4] / digest
+
+    def put(self, data: bytes) -> str:
+        """
+        写入内容并返回其哈希；相同内容只保存一份
+
+        先写临时文件再原子替换，避免并发写入或中断产生半个文件
+        """
+        digest = content_hash(data)
+        path = self.path_for(digest)
+        if path.exists():
+            # 刷新修改时间：垃圾回收会跳过近期写入的文件，避免删除尚未提交引用的内容
+            try:
+                os.utime(path)
+                return digest
+            except FileNotFoundError:
+                pass
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return digest
+
+    def locate(self, digest: Optional[str]) -> Optional[Path]:
+        """返回已存在的文件路径，不存在则返回None"""
+        if not digest:
+            return None
+        path = self.path_for(digest)
+        return path if path.is_file() else None
+
+    def delete(self, digest: str) -> bool:
+        """删除内容文件"""
+        path = self.path_for(digest)
+        if path.is_file():
+            path.unlink()
+            return True
+        return False
+
+    def iter_digests(self) -> Iterator[str]:
+        """遍历仓库中的全部内容哈希"""
+        if not self.root.exists():
+            return
+        for path in self.root.glob("??/??/*"):
+            if path.is_file() and not path.name.startswith(".tmp-"):
+                yield path.name
+
+
+class ImageStorage:
+    """截图存储后端基类"""
+
+    name = "base"
+    # 内容在文件仓库中时 BLOB 列写入空值 b""：旧表结构的 BLOB 列为 NOT NULL，不能写 NULL；
+    # 读取时空 BLOB 与 NULL 同样视为“不在数据库中”
+    EMPTY_BLOB = b""
+
+    def __init__(self, files: ContentAddressedStore):
+        self.files = files
+
+    def store(self, image, image_data: bytes, thumbnail_data: bytes, shared: bool = False) -> None:
+        """
+        保存截图内容到 PaperImage 记录（写入哈希，并由子类决定二进制存放位置）
+
+        Args:
+            image: PaperImage 实例
+            image_data: 压缩后的原图
+            thumbnail_data: 缩略图
+            shared: 内容与已有记录重复时为True，此时无论哪种后端都只在内容仓库保存一份
+        """
+        image.image_hash = content_hash(image_data)
+        image.thumbnail_hash = content_hash(thumbnail_data)
+        image.file_size = len(image_data)
+        if shared:
+            self._place_in_files(image, image_data, thumbnail_data)
+        else:
+            self._place(image, image_data, thumbnail_data)
+
+    def _place(self, image, image_data: bytes, thumbnail_data: bytes) -> None:
+        raise NotImplementedError
+
+    def _place_in_files(self, image, image_data: bytes, thumbnail_data: bytes) -> None:
+        """内容写入文件仓库（相同内容只保存一份），BLOB 列置空"""
+        self.files.put(image_data)
+        self.files.put(thumbnail_data)
+        image.image_data = self.EMPTY_BLOB
+        image.thumbnail_data = self.EMPTY_BLOB
+
+    def move_to_files(self, image) -> int:
+        """
+        把记录中仍内联保存的 BLOB 移入文件仓库（需已加载 BLOB 列），返回移出的字节数
+
+        用于去重：与新截图内容相同的旧记录也改为引用仓库中的同一个文件
+        """
+        moved = 0
+        if image.image_data:
+            image.image_hash = self.files.put(image.image_data)
+            moved += len(image.image_data)
+        if image.thumbnail_data:
+            image.thumbnail_hash = self.files.put(image.thumbnail_data)
+            moved += len(image.thumbnail_data)
+        image.image_data = self.EMPTY_BLOB
+        image.thumbnail_data = self.EMPTY_BLOB
+        return moved
+
+    @staticmethod
+    def digest_of(image, thumbnail: bool = False) -> Optional[str]:
+        return image.thumbnail_hash if thumbnail else image.image_hash
+
+    def file_path(self, image, thumbnail: bool = False) -> Optional[Path]:
+        """截图在内容仓库中的文件路径；仍保存在数据库中时返回None"""
+        return self.files.locate(self.digest_of(image, thumbnail))
+
+    def read(self, image, thumbnail: bool = False) -> Optional[bytes]:
+        """读取截图二进制（文件优先，其次数据库BLOB）"""
+        path = self.file_path(image, thumbnail)
+        if path:
+            return path.read_bytes()
+        data = image.thumbnail_data if thumbnail else image.image_data
+        return data or None
+
+
+class DatabaseImageStorage(ImageStorage):
+    """二进制保存在 paper_images 的 BLOB 列"""
+
+    name = "database"
+
+    def _place(self, image, image_data: bytes, thumbnail_data: bytes) -> None:
+        image.image_data = image_data
+        image.thumbnail_data = thumbnail_data
+
+
+class FileSystemImageStorage(ImageStorage):
+    """二进制按内容哈希保存为文件，BLOB 列留空"""
+
+    name = "filesystem"
+
+    def _place(self, image, image_data: bytes, thumbnail_data: bytes) -> None:
+        self._place_in_files(image, image_data, thumbnail_data)
+
+
+STORAGE_BACKENDS = {
+    DatabaseImageStorage.name: DatabaseImageStorage,
+    FileSystemImageStorage.name: FileSystemImageStorage,
+}
+
+
+def create_image_storage(backend: str = IMAGE_STORAGE, root: str = IMAGE_STORE_DIR) -> ImageStorage:
+    """按名称创建存储后端"""
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"不支持的图片存储后端: {backend}（可选: {', '.join(STORAGE_BACKENDS)}）")
+    return STORAGE_BACKENDS[backend](ContentAddressedStore(root))
+
+
+# 创建全局实例
+image_storage = create_image_storage()
@@ -0,0 +1,23 @@
+"""
+超导体分类
+七大类及历史分类的映射，供上传接口与数据集导出共用
+"""
+from typing import Optional
+
+SUPERCONDUCTOR_TYPES = {"cuprate", "iron_based", "nickel_based", "hydride", "carbon", "organic", "others"}
+LEGACY_SC_TYPE_MAP = {
+    "carbon_organic": "carbon",
+    "conventional": "others",
+    "other_conventional": "others",
+    "unconventional": "others",
+    "other_unconventional": "others",
+    "unknown": "others"
+}
+
+
+def normalize_superconductor_type(value: Optional[str]) -> str:
+    """兼容旧数据：将历史分类映射到七大类"""
+    if not value:
+        return "others"
+    normalized = LEGACY_SC_TYPE_MAP.get(value, value)
+    return normalized if normalized in SUPERCONDUCTOR_TYPES else "others"
@@ -0,0 +1,128 @@
+"""
+上传大小限制
+- 请求级：multipart 请求在读取请求体之前按 Content-Length 拒绝，边接收边计数，超限立即返回 413
+- 文件级：UploadFile 由 Starlette 写入 SpooledTemporaryFile（超过 1MB 落盘），读取前先按文件大小拒绝
+"""
+import json
+import os
+from typing import Optional
+
+from fastapi import HTTPException, UploadFile
+
+MB = 1024 * 1024
+
+# 单张截图上限
+MAX_IMAGE_UPLOAD_BYTES = int(float(os.environ.get("MAX_IMAGE_UPLOAD_MB", 20)) * MB)
+# 批量上传表格上限
+MAX_BATCH_UPLOAD_BYTES = int(float(os.environ.get("MAX_BATCH_UPLOAD_MB", 10)) * MB)
+# 整个 multipart 请求上限（5 张截图 + 表单字段）
+MAX_REQUEST_BYTES = int(float(os.environ.get("MAX_REQUEST_MB", 110)) * MB)
+
+READ_CHUNK_SIZE = MB
+
+
+def _too_large_detail(label: str, max_bytes: int) -> str:
+    return f"{label}超过大小限制（最大 {max_bytes / MB:.0f} MB）"
+
+
+def check_upload_size(upload: UploadFile, max_bytes: int, label: str = "文件") -> None:
+    """
+    按已接收的文件大小检查上限，超过时返回 413（用于直接流式读取 upload.file 的场景）
+
+    大小未知时由 RequestSizeLimitMiddleware 兜底
+    """
+    if upload.size is not None and upload.size > max_bytes:
+        raise HTTPException(status_code=413, detail=_too_large_detail(label, max_bytes))
+
+
+async def read_upload(upload: UploadFile, max_bytes: int, label: str = "文件") -> bytes:
+    """
+    读取上传文件，超过 max_bytes 时返回 413
+
+    文件大小已知时在读取前拒绝；未知时分块读取，超限即停止
+    """
+    check_upload_size(upload, max_bytes, label)
+
+    chunks = []
+    total = 0
+    while True:
+        chunk = await upload.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > max_bytes:
+            raise HTTPException(status_code=413, detail=_too_large_detail(label, max_bytes))
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+class RequestSizeLimitMiddleware:
+    """
+    限制 multipart 请求体大小的 ASGI 中间件
+
+    在表单解析（写临时文件）之前生效，超大请求不会被完整接收
+    """
+
+    def __init__(self, app, max_bytes: int = MAX_REQUEST_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._is_multipart(scope):
+            await self.app(scope, receive, send)
+            return
+
+        content_length = self._header(scope, b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_bytes:
+            await self._reject(send)
+            return
+
+        received = 0
+        rejected = False
+
+        async def limited_receive():
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    rejected = True
+                    await self._reject(send)
+                    # 让下游按客户端断开处理，停止解析
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            # 已返回 413 后丢弃下游的响应
+            if not rejected:
+                await send(message)
+
+        await self.app(scope, limited_receive, guarded_send)
+
+    @staticmethod
+    def _header(scope, name: bytes) -> Optional[str]:
+        for key, value in scope.get("headers", []):
+            if key == name:
+                return value.decode("latin-1")
+        return None
+
+    def _is_multipart(self, scope) -> bool:
+        content_type = self._header(scope, b"content-type") or ""
+        return content_type.startswith("multipart/form-data")
+
+    async def _reject(self, send) -> None:
+        body = json.dumps(
+            {"detail": _too_large_detail("请求", self.max_bytes)}, ensure_ascii=False
+        ).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"connection", b"close"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
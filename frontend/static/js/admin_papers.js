@@ -835,7 +835,7 @@ function renderImagesList(paperId, images) {
         html += `
             <div class="col-md-4 mb-3">
                 <div class="card">
-                    <img src="/api/papers/images/${img.id}?thumbnail=true" class="card-img-top" alt="截图${img.order}">
+                    <img src="/api/papers/images/${img.id}?thumbnail=true${img.thumbnail_hash ? `&v=${img.thumbnail_hash}` : ''}" class="card-img-top" alt="截图${img.order}">
                     <div class="card-body">
                         <h6 class="card-title">图片 ${img.order}</h6>
                         <p class="card-text">
@@ -123,12 +123,40 @@ async function loadPapers(searchParams = {}) {
         } else {
             await renderMultipleCombinations(container, queryString);
         }
+        loadFirstThumbnails(container);
     } catch (error) {
         console.error('加载文献失败:', error);
         container.innerHTML = `<div class="alert alert-danger">加载失败：${error.message}</div>`;
     }
 }
 
+// 一次请求获取列表中所有文献第一张截图的缩略图，作为主图的预览
+async function loadFirstThumbnails(container) {
+    const images = Array.from(container.querySelectorAll('img.paper-main-image[data-src]'));
+    if (images.length === 0) return;
+
+    const imageByPaper = new Map(images.map(img => [img.dataset.paperId, img]));
+    const ids = Array.from(imageByPaper.keys());
+    // 与后端单次上限保持一致
+    for (let start = 0; start < ids.length; start += 200) {
+        try {
+            const response = await fetch(`/api/papers/thumbnails?ids=${ids.slice(start, start + 200).join(',')}`);
+            if (!response.ok) continue;
+            const text = await response.text();
+            text.split('\n').filter(line => line).forEach(line => {
+                const item = JSON.parse(line);
+                const img = imageByPaper.get(String(item.paper_id));
+                // 已展开并加载主图的不再覆盖
+                if (img && img.dataset.src) {
+                    img.src = `data:${item.media_type};base64,${item.data}`;
+                }
+            });
+        } catch (error) {
+            console.error('加载缩略图失败:', error);
+        }
+    }
+}
+
 // 审核状态筛选
 function filterByReviewStatus(status) {
     currentReviewStatus = status;
@@ -386,7 +414,9 @@ function renderPaperCard(paper) {
                         <!-- 右侧：第一张大图 -->
                         ${paper.image_count > 0 ? `
                         <div class="col-md-4">
-                            <img src="/api/papers/${paper.id}/images/1"
+                            <img data-paper-id="${paper.id}"
+                                 data-src="/api/papers/${paper.id}/images/1?width=640"
+                                 data-srcset="/api/papers/${paper.id}/images/1?width=640 1x, /api/papers/${paper.id}/images/1?width=1280 2x"
                                  class="img-fluid paper-main-image"
                                  onclick="viewImage('/api/papers/${paper.id}/images/1')"
                                  alt="主图"
@@ -418,6 +448,13 @@ function togglePaperDetails(paperId) {
     if (details.style.display === 'none') {
         details.style.display = 'block';
         chevron.textContent = '▲';
+        // 展开时才加载主图（此前显示批量获取的缩略图）
+        const mainImage = details.querySelector('img.paper-main-image[data-src]');
+        if (mainImage) {
+            mainImage.srcset = mainImage.dataset.srcset;
+            mainImage.src = mainImage.dataset.src;
+            delete mainImage.dataset.src;
+        }
     } else {
         details.style.display = 'none';
         chevron.textContent = '▼';
@@ -0,0 +1,126 @@
+"""
+DOI 解析延迟压测：对比“每次请求新建客户端”（旧实现）与共享长连接客户端
+
+在本地启动一个模拟 CrossRef 的 HTTP 服务，不访问外网，也不经过 doi_metadata 缓存。
+
+使用方法（在项目根目录执行）：
+python scripts/bench_doi_resolver.py
+python scripts/bench_doi_resolver.py --requests=500 --concurrency=10 --delay-ms=20
+python scripts/bench_doi_resolver.py --url=https://api.crossref.org/works/ --requests=20   # 对真实服务测试
+"""
+import asyncio
+import json
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.utils.cli import get_option  # noqa: E402
+from backend.utils.doi_resolver import DOIResolver  # noqa: E402
+
+SAMPLE_DOI = "10.1103/physrevlett.122.027001"
+
+
+class StubCrossRefHandler(BaseHTTPRequestHandler):
+    """模拟 CrossRef works 接口，支持 keep-alive"""
+
+    protocol_version = "HTTP/1.1"
+    delay = 0.0
+
+    def do_GET(self):
+        if self.delay:
+            time.sleep(self.delay)
+        doi = self.path.rsplit("/works/", 1)[-1]
+        body = json.dumps({
+            "status": "ok",
+            "message": {
+                "DOI": doi,
+                "title": ["Stub title"],
+                "author": [{"given": "A", "family": "Author"}],
+                "container-title": ["Phys. Rev. Lett."],
+                "volume": "122",
+                "page": "027001",
+                "published-print": {"date-parts": [[2019, 1, 14]]},
+            },
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(delay_ms: float) -> ThreadingHTTPServer:
+    StubCrossRefHandler.delay = delay_ms / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubCrossRefHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def _run(fetch, total: int, concurrency: int):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await fetch(f"{SAMPLE_DOI}.{i}")
+            latencies.append((time.perf_counter() - started) * 1000)
+            response.raise_for_status()
+
+    started = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(total)])
+    return latencies, time.perf_counter() - started
+
+
+def _report(name: str, latencies, elapsed: float):
+    ordered = sorted(latencies)
+    p95 = ordered[max(0, int(len(ordered) * 0.95) - 1)]
+    print(f"{name:<28} 平均 {statistics.mean(ordered):7.2f} ms  中位 {statistics.median(ordered):7.2f} ms  "
+          f"P95 {p95:7.2f} ms  吞吐 {len(ordered) / elapsed:7.1f} 次/秒")
+
+
+async def main():
+    total = get_option("requests", 200)
+    concurrency = get_option("concurrency", 5)
+    delay_ms = get_option("delay-ms", 0.0)
+    url = get_option("url", "")
+
+    server = None
+    if not url:
+        server = start_stub_server(delay_ms)
+        url = f"http://127.0.0.1:{server.server_address[1]}/works/"
+    print(f"目标: {url}  请求数: {total}  并发: {concurrency}")
+
+    resolver = DOIResolver(api_url=url)
+
+    async def fetch_new_client(doi):
+        # 旧实现：每次请求新建客户端，重新建立连接
+        async with httpx.AsyncClient(timeout=resolver.timeout) as client:
+            return await client.get(f"{resolver.crossref_api_url}{doi}")
+
+    async def fetch_shared_client(doi):
+        # 直接使用共享客户端，不经过 fetch_work 的限速与重试，两组只比较连接开销
+        return await resolver.client.get(f"{resolver.crossref_api_url}{doi}")
+
+    try:
+        _report("每次新建客户端", *await _run(fetch_new_client, total, concurrency))
+        await resolver.start()
+        _report("共享长连接客户端", *await _run(fetch_shared_client, total, concurrency))
+    finally:
+        await resolver.close()
+        if server:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,30 @@
+"""
+HTTP Range 解析测试
+"""
+import pytest
+
+from backend.utils.http_range import RangeNotSatisfiable, parse_range_header
+
+SIZE = 14686
+
+
+def test_open_ended_range_past_eof_is_unsatisfiable():
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range_header("bytes=999999-", SIZE)
+
+
+def test_closed_range_past_eof_is_unsatisfiable():
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range_header("bytes=999999-9999999", SIZE)
+
+
+def test_open_ended_range_within_content():
+    assert parse_range_header("bytes=100-", SIZE) == [(100, SIZE - 1)]
+
+
+def test_unsatisfiable_part_is_dropped_from_multi_range():
+    assert parse_range_header("bytes=0-9,999999-", SIZE) == [(0, 9)]
+
+
+def test_reversed_range_is_ignored():
+    assert parse_range_header("bytes=5-3", SIZE) is None